@@ -0,0 +1,94 @@
+"""Memory held per WebSocket connection: detached ORM User vs ConnectedUser.
+
+Run with: python -m api.benchmarks.connection_memory [--connections 10000]
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.migrations import upgrade
+from api.models.user import User, UserStatus
+from api.services.websocket_manager import ConnectedUser
+from api.utils.helpers import generate_avatar_url, get_random_chat_color
+
+SETTINGS = {
+    "notifications": {"soundEnabled": True, "desktopNotifications": True},
+    "privacy": {"showLastSeen": True, "allowPrivateMessages": True},
+    "appearance": {"theme": "system", "fontSize": "medium"},
+    "chat": {"enterToSend": True, "showTimestamps": True},
+}
+
+
+def seed(session_factory, count: int):
+    db = session_factory()
+    for i in range(count):
+        nickname = f"user{i:05d}"
+        db.add(
+            User(
+                nickname=nickname,
+                age_group="adults",
+                avatar=generate_avatar_url(nickname),
+                chat_color=get_random_chat_color(),
+                roles=["Member"],
+                previous_nicknames=[f"old{i}", f"older{i}"],
+                status=UserStatus.ONLINE,
+                settings=SETTINGS,
+            )
+        )
+    db.commit()
+    db.close()
+
+
+def load_users(session_factory):
+    """Load users the way the manager used to: in a session it then closes"""
+    db = session_factory()
+    users = db.query(User).all()
+    db.close()
+    return users
+
+
+def measure(session_factory, build_records: bool) -> int:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    held = load_users(session_factory)
+    if build_records:
+        held = [ConnectedUser.from_user(user) for user in held]
+    gc.collect()
+
+    size = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=10_000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    upgrade(engine)
+    session_factory = sessionmaker(bind=engine)
+    seed(session_factory, args.connections)
+    # Warm SQLAlchemy's statement caches so they are not counted
+    load_users(session_factory)
+
+    orm = measure(session_factory, build_records=False)
+    records = measure(session_factory, build_records=True)
+
+    print(f"connections={args.connections}")
+    for name, size in (("ORM User", orm), ("ConnectedUser", records)):
+        print(
+            f"{name:<14} {size / 1024 / 1024:8.2f} MiB total "
+            f"{size / args.connections:8.0f} B/connection"
+        )
+
+
+if __name__ == "__main__":
+    main()
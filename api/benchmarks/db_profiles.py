@@ -0,0 +1,119 @@
+"""Concurrent read/write throughput of the database engine profiles.
+
+Writers insert chat messages one commit at a time while readers fetch the
+latest page of history, all through the async engine the API uses. Each
+profile runs against a fresh database: SQLite with library defaults, then
+with the SQLITE_* pragmas. Pass --postgres to also compare the default pool
+with the DB_POOL_* settings on a server; its messages table is cleared
+between runs.
+
+Run with: python -m api.benchmarks.db_profiles [--writers 8] [--readers 32]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, delete, desc, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.database import async_url, engine_options, is_sqlite, tune_sqlite
+from api.migrations import upgrade
+from api.models.message import Message
+from api.models.user import User
+
+
+def prepare(url: str) -> int:
+    """Migrate the schema and create one author; returns the author's ID"""
+    engine = create_engine(url)
+    upgrade(engine)
+    with engine.begin() as connection:
+        connection.execute(delete(Message))
+        user_id = connection.execute(
+            select(User.id).where(User.nickname == "bench")
+        ).scalar()
+        if user_id is None:
+            user_id = connection.execute(
+                User.__table__.insert().values(
+                    nickname="bench", age_group="adults", roles=["Member"]
+                )
+            ).inserted_primary_key[0]
+    engine.dispose()
+    return user_id
+
+
+async def measure(async_engine, user_id: int, writers: int, readers: int, duration):
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    counts = {"writes": 0, "reads": 0, "errors": 0}
+    deadline = time.perf_counter() + duration
+
+    async def write():
+        while time.perf_counter() < deadline:
+            try:
+                async with session_factory() as db:
+                    db.add(
+                        Message(user_id=user_id, nickname="bench", content="load test")
+                    )
+                    await db.commit()
+                counts["writes"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+
+    async def read():
+        while time.perf_counter() < deadline:
+            try:
+                async with session_factory() as db:
+                    await db.scalars(
+                        select(Message).order_by(desc(Message.created_at)).limit(50)
+                    )
+                counts["reads"] += 1
+            except OperationalError:
+                counts["errors"] += 1
+
+    await asyncio.gather(
+        *[write() for _ in range(writers)], *[read() for _ in range(readers)]
+    )
+    await async_engine.dispose()
+    return counts
+
+
+def profiles(args):
+    """(name, sync URL, create_async_engine kwargs, tuned) per profile"""
+    workdir = tempfile.mkdtemp(prefix="db_profiles_")
+    for name, tuned in (("sqlite default", False), ("sqlite tuned", True)):
+        url = f"sqlite:///{os.path.join(workdir, name.replace(' ', '_'))}.db"
+        yield name, url, {}, tuned
+    if args.postgres:
+        yield "postgres default", args.postgres, {}, False
+        yield "postgres tuned", args.postgres, engine_options(args.postgres), True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--postgres", help="postgresql:// URL of a scratch database")
+    args = parser.parse_args()
+
+    print(f"writers={args.writers} readers={args.readers} duration={args.duration}s")
+    for name, url, options, tuned in profiles(args):
+        user_id = prepare(url)
+        async_engine = create_async_engine(async_url(url), **options)
+        if tuned and is_sqlite(url):
+            tune_sqlite(async_engine.sync_engine)
+        counts = asyncio.run(
+            measure(async_engine, user_id, args.writers, args.readers, args.duration)
+        )
+        print(
+            f"{name:<18} {counts['writes'] / args.duration:9.1f} writes/s "
+            f"{counts['reads'] / args.duration:9.1f} reads/s "
+            f"{counts['errors']:6d} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Per-broadcast CPU cost of encoding one chat message for N recipients.
+
+Run with: python -m api.benchmarks.frame_encoding [--recipients 5000]
+"""
+
+import argparse
+import json
+import time
+
+from api.utils import serialization
+from api.utils.serialization import Frame
+
+
+def sample_message() -> dict:
+    return {
+        "type": "message",
+        "data": {
+            "id": "48213",
+            "nickname": "night_owl",
+            "content": "has anyone tried the new build? the websocket reconnects feel "
+            "much snappier on my phone 🚀",
+            "timestamp": "2024-05-02T21:14:07.512344",
+            "type": "message",
+            "embedData": {
+                "url": "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+                "title": "Release notes",
+            },
+            "fileData": None,
+            "targetUser": None,
+        },
+    }
+
+
+def per_recipient_json(message: dict, recipients: int):
+    for _ in range(recipients):
+        json.dumps(message)
+
+
+def encode_once(message: dict, recipients: int):
+    frame = Frame(message)
+    for _ in range(recipients):
+        frame.text
+
+
+def measure(func, message: dict, recipients: int, rounds: int) -> float:
+    start = time.process_time()
+    for _ in range(rounds):
+        func(message, recipients)
+    return (time.process_time() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    message = sample_message()
+    results = [
+        (
+            "json.dumps per recipient",
+            measure(per_recipient_json, message, args.recipients, args.rounds),
+        ),
+        (
+            "Frame, encode once",
+            measure(encode_once, message, args.recipients, args.rounds),
+        ),
+    ]
+
+    codec = "orjson" if serialization.orjson is not None else "json"
+    print(f"recipients={args.recipients} rounds={args.rounds} codec={codec}")
+    baseline = results[0][1]
+    for name, ms in results:
+        print(f"{name:<28} {ms:9.3f} ms/broadcast  ({baseline / ms:6.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Chat message write throughput with and without group commit.
+
+Concurrent writers post room messages through ``MessageIngest``, the path
+``POST /api/messages`` takes, against a fresh database per run: first with
+a zero window (one INSERT and commit per message), then with each
+--window. SQLite gets the SQLITE_* pragmas; pass --postgres to also run
+against a scratch server database, whose messages table is cleared first.
+
+Run with: python -m api.benchmarks.group_commit [--writers 64] [--window 2 5]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.benchmarks.db_profiles import prepare
+from api.database import async_url, engine_options, is_sqlite, tune_sqlite
+from api.services.ingest import MessageIngest
+from api.services.metrics import metrics
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def measure(url: str, user_id: int, writers: int, window: int, duration):
+    async_engine = create_async_engine(async_url(url), **engine_options(url))
+    if is_sqlite(url):
+        tune_sqlite(async_engine.sync_engine)
+    ingest = MessageIngest(
+        async_sessionmaker(async_engine, expire_on_commit=False), window_ms=window
+    )
+    latencies = []
+    deadline = time.perf_counter() + duration
+    commits = metrics.counters["db.group_commits"]
+
+    async def write():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await ingest.submit(
+                {"user_id": user_id, "nickname": "bench", "content": "load test"}
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*[write() for _ in range(writers)])
+    await ingest.stop()
+    await async_engine.dispose()
+    return latencies, metrics.counters["db.group_commits"] - commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument(
+        "--window", type=int, nargs="+", default=[2, 5], help="milliseconds"
+    )
+    parser.add_argument("--postgres", help="postgresql:// URL of a scratch database")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="group_commit_")
+    print(f"writers={args.writers} duration={args.duration}s")
+    for window in [0, *args.window]:
+        urls = [("sqlite", f"sqlite:///{os.path.join(workdir, f'w{window}.db')}")]
+        if args.postgres:
+            urls.append(("postgres", args.postgres))
+        for name, url in urls:
+            user_id = prepare(url)
+            latencies, commits = asyncio.run(
+                measure(url, user_id, args.writers, window, args.duration)
+            )
+            print(
+                f"{name:<8} window={window:<3}ms "
+                f"{len(latencies) / args.duration:9.1f} messages/s "
+                f"{len(latencies) / max(commits, 1):6.1f} per commit "
+                f"p50 {percentile(latencies, 50):7.2f} ms "
+                f"p99 {percentile(latencies, 99):7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Cost of building one page of message history, ORM path against fast path.
+
+Each page is the newest --limit messages, read in its own session as a
+request would. The ORM path loads ``Message`` entities, calls ``to_dict``
+and renders through ``jsonable_encoder`` and the stdlib ``JSONResponse``,
+which is what list endpoints used to do. The fast path selects
+``MESSAGE_COLUMNS``, builds dicts with ``message_dict`` and renders with
+``FastJSONResponse`` (orjson when installed). Both produce the same JSON.
+
+Run with: python -m api.benchmarks.serialization [--limit 100] [--pages 500]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.benchmarks.db_profiles import prepare
+from api.benchmarks.frame_encoding import sample_message
+from api.database import async_url, engine_options, tune_sqlite
+from api.models.message import MESSAGE_COLUMNS, Message, message_dict
+from api.utils import serialization
+from api.utils.helpers import utcnow
+from api.utils.pagination import fetch, keyset_query
+from api.utils.serialization import FastJSONResponse, loads
+
+
+def fill(url: str, user_id: int, count: int):
+    data = sample_message()["data"]
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Message),
+            [
+                {
+                    "user_id": user_id,
+                    "nickname": data["nickname"],
+                    "content": f"{data['content']} #{i}",
+                    "embed_data": data["embedData"],
+                    "created_at": utcnow(),
+                }
+                for i in range(count)
+            ],
+        )
+    engine.dispose()
+
+
+async def orm_page(db, limit: int) -> bytes:
+    messages = await db.scalars(keyset_query(select(Message), Message, limit))
+    content = {
+        "success": True,
+        "data": [message.to_dict() for message in messages],
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+async def fast_page(db, limit: int) -> bytes:
+    rows = await fetch(db, keyset_query(select(*MESSAGE_COLUMNS), Message, limit))
+    content = {"success": True, "data": [message_dict(row) for row in rows]}
+    return FastJSONResponse(content).body
+
+
+async def measure(url: str, build, limit: int, pages: int):
+    async_engine = create_async_engine(async_url(url), **engine_options(url))
+    tune_sqlite(async_engine.sync_engine)
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    async with session_factory() as db:
+        body = await build(db, limit)  # warm up connection and statement cache
+
+    start = time.process_time()
+    for _ in range(pages):
+        async with session_factory() as db:
+            await build(db, limit)
+    elapsed = time.process_time() - start
+    await async_engine.dispose()
+    return elapsed / pages * 1000, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=500)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='serialization_'), 'b.db')}"
+    fill(url, prepare(url), args.limit * 2)
+
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"limit={args.limit} pages={args.pages} encoder={encoder}")
+    baseline, bodies = None, []
+    for name, build in [
+        ("orm + jsonable_encoder", orm_page),
+        ("columns + FastJSONResponse", fast_page),
+    ]:
+        per_page, body = asyncio.run(measure(url, build, args.limit, args.pages))
+        bodies.append(loads(body))
+        baseline = baseline or per_page
+        print(
+            f"{name:<28} {per_page:8.3f} ms/page "
+            f"{1000 / per_page:8.0f} pages/s {baseline / per_page:6.2f}x"
+        )
+    if bodies[0] != bodies[1]:
+        print("warning: the two paths rendered different JSON")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Replay a keystroke trace and count outbound typing frames.
+
+Compares sending every typing event as it arrives against coalescing them
+into per-window presence snapshots, with every client connected with
+``snapshots=1``.
+
+Run with: python -m api.benchmarks.typing_coalescing [--users 500 --typists 40]
+"""
+
+import argparse
+import asyncio
+import random
+
+from api.services.coalescing import PresenceCoalescer
+from api.services.websocket_manager import ConnectedUser, WebSocketManager
+
+
+class CountingSocket:
+    """Stands in for a client socket and only counts what it receives"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, text: str):
+        self.frames += 1
+        self.bytes += len(text)
+
+
+def keystroke_trace(typists: int, duration: float, seed: int):
+    """(time, typist, is_typing) events: bursts of keystrokes with pauses"""
+    rng = random.Random(seed)
+    events = []
+    for typist in range(typists):
+        t = rng.uniform(0, 1)
+        while t < duration:
+            burst_end = t + rng.uniform(1, 4)
+            while t < min(burst_end, duration):
+                events.append((t, typist, True))
+                t += rng.uniform(0.08, 0.25)
+            events.append((t, typist, False))
+            t += rng.uniform(0.5, 3)
+    return sorted(events)
+
+
+async def replay(window_ms: int, args) -> dict:
+    manager = WebSocketManager()
+    manager.coalescer = PresenceCoalescer(manager, window_ms) if window_ms else None
+
+    sockets, users = [], []
+    for i in range(args.users):
+        user = ConnectedUser(id=i + 1, nickname=f"user{i}")
+        socket = CountingSocket()
+        manager.register(socket, user, snapshots=bool(window_ms))
+        sockets.append(socket)
+        users.append(user)
+
+    trace = keystroke_trace(args.typists, args.duration, args.seed)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for at, typist, is_typing in trace:
+        delay = start + at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        websocket = sockets[typist]
+        await manager.handle_message(
+            websocket, {"type": "typing", "data": {"isTyping": is_typing}}
+        )
+
+    # Let the last window flush and the writers drain
+    await asyncio.sleep(window_ms / 1000 + 0.2)
+    for websocket in list(manager.active_connections):
+        await manager.disconnect(websocket)
+
+    return {
+        "events": len(trace),
+        "frames": sum(s.frames for s in sockets),
+        "bytes": sum(s.bytes for s in sockets),
+    }
+
+
+async def run(args):
+    print(
+        f"users={args.users} typists={args.typists} duration={args.duration}s "
+        f"window={args.window}ms"
+    )
+    baseline = await replay(0, args)
+    coalesced = await replay(args.window, args)
+    for name, result in (("per-event", baseline), ("coalesced", coalesced)):
+        print(
+            f"{name:<10} inbound={result['events']:6d} "
+            f"outbound frames={result['frames']:9d} bytes={result['bytes']:11d}"
+        )
+    print(f"frame reduction: {baseline['frames'] / max(coalesced['frames'], 1):.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--typists", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--window", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Load test for /ws: connect rate, broadcast latency, frames/sec and RSS.
+
+Starts the API in a child process against a throwaway SQLite database,
+seeds users straight into it and opens thousands of WebSocket clients
+from this process. For --duration seconds it then drives a mix of chat
+messages (posted over REST and broadcast to everyone), typing events and
+status changes, and measures how long each message takes to reach every
+client.
+
+Run with: python -m api.benchmarks.ws_load [--clients 2000] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import tempfile
+import time
+
+import websockets
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def serve(port: int):
+    """Child process: run the app the way uvicorn would in production"""
+    import uvicorn
+
+    from api.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def seed(count: int) -> list:
+    """Create users directly in the database and mint their tokens"""
+    from api.database import SessionLocal, engine
+    from api.migrations import upgrade
+    from api.models.user import User
+    from api.services.auth_service import create_access_token
+
+    upgrade(engine)
+    db = SessionLocal()
+    users = [
+        User(nickname=f"load{i:05d}", age_group="adults", roles=["Member"])
+        for i in range(count)
+    ]
+    db.add_all(users)
+    db.commit()
+    tokens = [
+        create_access_token(data={"sub": str(user.id), "nickname": user.nickname})
+        for user in users
+    ]
+    db.close()
+    return tokens
+
+
+def rss_mb(pid: int) -> float:
+    try:
+        import psutil
+
+        return psutil.Process(pid).memory_info().rss / 1024 / 1024
+    except ImportError:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Stats:
+    def __init__(self):
+        self.frames = 0
+        self.latencies = []
+
+
+async def client(url: str, stats: Stats, ready: list, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        websocket = await websockets.connect(url, open_timeout=60, max_size=None)
+    ready.append(websocket)
+    try:
+        async for raw in websocket:
+            now = time.perf_counter()
+            events = json.loads(raw)
+            for event in events if isinstance(events, list) else [events]:
+                stats.frames += 1
+                kind = event.get("type")
+                if kind == "message":
+                    sent = float(event["data"]["content"].split()[1])
+                    stats.latencies.append(now - sent)
+                elif kind == "ping":
+                    await websocket.send('{"type":"pong"}')
+    except websockets.ConnectionClosed:
+        pass
+
+
+def post_message(port: int, token: str, connection: list):
+    """Blocking keep-alive POST, run in a worker thread"""
+    if not connection:
+        connection.append(http.client.HTTPConnection("127.0.0.1", port))
+    body = json.dumps({"content": f"bench {time.perf_counter():.6f}"})
+    connection[0].request(
+        "POST",
+        "/api/messages",
+        body=body,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json",
+        },
+    )
+    response = connection[0].getresponse()
+    response.read()
+    if response.status != 200:
+        raise RuntimeError(f"POST /api/messages returned {response.status}")
+
+
+async def every(rate: float, duration: float, action):
+    """Call ``action`` ``rate`` times a second for ``duration`` seconds"""
+    if rate <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for n in range(int(rate * duration)):
+        await asyncio.sleep(max(0.0, start + n / rate - loop.time()))
+        await action()
+
+
+async def run(args, port: int, tokens: list, server_pid: int):
+    query = ("&batch=1" if args.batch else "") + (
+        "&snapshots=1" if args.snapshots else ""
+    )
+    stats = Stats()
+    ready = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    idle_rss = rss_mb(server_pid)
+
+    start = time.perf_counter()
+    tasks = [
+        asyncio.create_task(
+            client(
+                f"ws://127.0.0.1:{port}/ws?token={token}{query}",
+                stats,
+                ready,
+                semaphore,
+            )
+        )
+        for token in tokens
+    ]
+    while len(ready) < len(tokens):
+        await asyncio.sleep(0.05)
+        failed = [task for task in tasks if task.done() and task.exception()]
+        if failed:
+            raise failed[0].exception()
+    connect_time = time.perf_counter() - start
+    connected_rss = rss_mb(server_pid)
+
+    # Let join diffs settle before measuring
+    await asyncio.sleep(1)
+    stats.frames = 0
+    connection = []
+
+    async def send_message():
+        await asyncio.to_thread(post_message, port, random.choice(tokens), connection)
+
+    async def send_typing():
+        await random.choice(ready).send(
+            json.dumps({"type": "typing", "data": {"isTyping": random.random() < 0.5}})
+        )
+
+    from api.models.user import UserStatus
+
+    # Only values the server accepts, so each one takes the presence path
+    statuses = [status.value for status in UserStatus]
+
+    async def send_status():
+        status = random.choice(statuses)
+        await random.choice(ready).send(
+            json.dumps({"type": "status_update", "data": {"status": status}})
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        every(args.messages, args.duration, send_message),
+        every(args.typing, args.duration, send_typing),
+        every(args.status, args.duration, send_status),
+    )
+    # Give the last broadcast time to arrive everywhere
+    await asyncio.sleep(1)
+    elapsed = time.perf_counter() - start
+    loaded_rss = rss_mb(server_pid)
+
+    for websocket in ready:
+        await websocket.close()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    expected = int(args.messages * args.duration) * len(tokens)
+    latencies = [value * 1000 for value in stats.latencies]
+    print(
+        f"clients={len(tokens)} duration={args.duration}s messages/s={args.messages} "
+        f"typing/s={args.typing} status/s={args.status} batch={args.batch} "
+        f"snapshots={args.snapshots}"
+    )
+    print(
+        f"connect        {len(tokens) / connect_time:10.1f} conn/s "
+        f"({connect_time:.2f}s total)"
+    )
+    print(
+        f"delivered      {len(latencies):10d} / {expected} messages "
+        f"({len(latencies) / max(expected, 1):.1%})"
+    )
+    for pct in (50, 90, 99, 99.9):
+        print(f"latency p{pct:<5} {percentile(latencies, pct):10.2f} ms")
+    print(f"latency max    {max(latencies, default=float('nan')):10.2f} ms")
+    print(f"frames         {stats.frames / elapsed:10.1f} frames/s received")
+    print(
+        f"server RSS     {idle_rss:10.1f} MB idle, {connected_rss:.1f} MB connected, "
+        f"{loaded_rss:.1f} MB after load"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--messages", type=float, default=20, help="per second")
+    parser.add_argument("--typing", type=float, default=50, help="per second")
+    parser.add_argument("--status", type=float, default=5, help="per second")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--batch", action="store_true", help="connect with ?batch=1")
+    parser.add_argument(
+        "--snapshots", action="store_true", help="connect with ?snapshots=1"
+    )
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    workdir = tempfile.mkdtemp(prefix="ws_load_")
+    # Read by the settings of both this process and the server
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ.setdefault("RATE_LIMIT_REQUESTS", "1000000000")
+
+    tokens = seed(args.clients)
+    port = free_port()
+    server = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(port,), daemon=True
+    )
+    server.start()
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or not server.is_alive():
+                    raise RuntimeError("API server did not start")
+                time.sleep(0.1)
+        asyncio.run(run(args, port, tokens, server.pid))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
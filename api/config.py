@@ -6,11 +6,42 @@ import os
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./chatconnect.db"
+    # Apply pending migrations at startup; disable when several workers start
+    # at once and run `python -m api.migrations` before deploying instead
+    DB_MIGRATE_ON_STARTUP: bool = True
+    # SQLite pragmas applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"  # Readers don't wait for writers
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # fsync at checkpoints, not every commit
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Bytes of the file read via mmap
+    SQLITE_CACHE_SIZE: int = -64000  # Negative means KiB: 64 MB page cache
+    SQLITE_BUSY_TIMEOUT: int = 5000  # Milliseconds to wait on a locked database
+    # Connection pool for server databases (Postgres)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    # Room messages arriving within this window share one INSERT and commit;
+    # 0 commits each message on its own
+    DB_GROUP_COMMIT_WINDOW_MS: int = 2
+    DB_GROUP_COMMIT_MAX_BATCH: int = 256  # Messages per INSERT
+    # Per-worker lookup caches (entries)
+    PRIVATE_CHAT_CACHE_SIZE: int = 10000  # User pair -> private chat ID
+    NICKNAME_CACHE_SIZE: int = 10000  # Nickname -> user ID
+    NICKNAME_NEGATIVE_TTL: int = 5  # Seconds an unknown nickname stays unknown
+    # Newest messages kept serialized in memory for the first history page
+    HISTORY_WINDOW_SIZE: int = 200  # Room messages
+    HISTORY_PRIVATE_WINDOW_SIZE: int = 100  # Messages per private chat
+    HISTORY_PRIVATE_CHATS: int = 1000  # Private chats with a window
 
     # JWT
     JWT_SECRET: str = "your-super-secret-jwt-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_IN: int = 24 * 60 * 60  # 24 hours in seconds
+    # Decoded tokens and users kept per worker, so authenticated requests skip
+    # the JWT check and the users lookup. 0 disables the cache.
+    AUTH_CACHE_TTL: int = 30  # Seconds
+    AUTH_CACHE_SIZE: int = 10000  # Entries
 
     # CORS
     ALLOWED_ORIGINS: List[str] = [
@@ -39,9 +70,27 @@ class Settings(BaseSettings):
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60  # seconds
 
+    # WebSocket
+    WS_SEND_QUEUE_SIZE: int = 256  # Per-connection high-water mark (frames)
+    WS_SLOW_CONSUMER_POLICY: str = "disconnect"  # drop, coalesce or disconnect
+    WS_TYPING_WINDOW_MS: int = 250  # Typing/status snapshot window, 0 disables
+    WS_PING_INTERVAL: int = 20  # Seconds of quiet before the server pings, 0 disables
+    WS_IDLE_TIMEOUT: int = 60  # Seconds without an answer before a socket is dropped
+    WS_BATCH_WINDOW_MS: int = 5  # Frame batching window for ?batch=1 clients
+    WS_REPLAY_BUFFER_SIZE: int = 1024  # Broadcasts kept for reconnects, 0 disables
+    WS_PER_MESSAGE_DEFLATE: bool = False  # Offer permessage-deflate to clients
+    WS_COMPRESSION_LEVEL: int = 6  # zlib level, 1 (fast) to 9 (small)
+    # Reset the deflate window per message: less memory, worse ratio
+    WS_COMPRESSION_NO_CONTEXT_TAKEOVER: bool = False
+
     # Redis (for production)
     REDIS_URL: str = "redis://localhost:6379"
 
+    # WebSocket fan-out between workers: memory (single worker) or redis
+    WS_BACKPLANE: str = "memory"
+    WS_BACKPLANE_CHANNEL: str = "chatconnect:ws"
+    WS_PRESENCE_TTL: int = 30  # Seconds before a silent worker's users go offline
+
     class Config:
         env_file = ".env"
         extra = "ignore"
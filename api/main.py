@@ -5,7 +5,7 @@ import uvicorn
 import os
 from contextlib import asynccontextmanager
 
-from .database import engine, Base
+from .migrations import upgrade as run_migrations
 from .routers import (
     auth,
     messages,
@@ -16,23 +16,25 @@ from .routers import (
     private_chats,
     settings as settings_router,
 )
-from .services.websocket_manager import WebSocketManager
+from .services.websocket_manager import websocket_manager
+from .services.ingest import message_ingest
+from .services.metrics import metrics
 from .middleware.rate_limit import RateLimitMiddleware
 from .config import settings
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# WebSocket manager
-websocket_manager = WebSocketManager()
+from .utils.serialization import FastJSONResponse
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 ChatConnect API starting up...")
+    if settings.DB_MIGRATE_ON_STARTUP:
+        run_migrations()
+    await websocket_manager.start()
     yield
     # Shutdown
+    await message_ingest.stop()
+    await websocket_manager.stop()
     print("🛑 ChatConnect API shutting down...")
 
 
@@ -41,6 +43,8 @@ app = FastAPI(
     description="Real-time chat application API",
     version="1.0.0",
     lifespan=lifespan,
+    # orjson when installed, for every route that doesn't pick its own
+    default_response_class=FastJSONResponse,
 )
 
 # CORS middleware
@@ -53,7 +57,9 @@ app.add_middleware(
 )
 
 # Rate limiting middleware
-app.add_middleware(RateLimitMiddleware)
+app.add_middleware(
+    RateLimitMiddleware, requests_per_minute=settings.RATE_LIMIT_REQUESTS
+)
 
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -83,16 +89,43 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, token: str = None):
-    await websocket_manager.connect(websocket, token)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    token: str = None,
+    batch: bool = False,
+    last_seq: int = None,
+    epoch: str = None,
+    snapshots: bool = False,
+    heartbeat: bool = False,
+):
+    await websocket_manager.connect(
+        websocket, token, batch, last_seq, epoch, snapshots, heartbeat
+    )
     try:
         while True:
-            data = await websocket.receive_json()
+            data = await websocket_manager.receive(websocket)
             await websocket_manager.handle_message(websocket, data)
     except WebSocketDisconnect:
         await websocket_manager.disconnect(websocket)
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=3001, reload=True, log_level="info")
+    from .utils.ws_protocol import TunedWebSocketProtocol
+
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=3001,
+        reload=True,
+        log_level="info",
+        ws=TunedWebSocketProtocol,
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE,
+        ws_ping_interval=settings.WS_PING_INTERVAL or None,
+        ws_ping_timeout=settings.WS_IDLE_TIMEOUT or None,
+    )
@@ -19,7 +19,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         client_ip = request.client.host
 
         # Skip rate limiting for certain endpoints
-        if request.url.path in ["/health", "/", "/docs", "/openapi.json"]:
+        if request.url.path in ["/health", "/", "/docs", "/openapi.json", "/metrics"]:
             return await call_next(request)
 
         current_time = time.time()
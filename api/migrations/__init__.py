@@ -0,0 +1,75 @@
+"""Versioned schema migrations.
+
+Each step in ``MIGRATIONS`` moves the schema forward by one version and is
+applied at most once; applied versions are recorded in ``schema_version``.
+Steps check before they create or drop anything, so a database built by
+the old ``create_all`` at startup is adopted without errors.
+"""
+
+import logging
+from typing import List, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.engine import Connection, Engine
+
+from api.migrations import (
+    v0001_initial_schema,
+    v0002_chat_indexes,
+    v0003_private_chat_summaries,
+    v0004_canonical_chat_pairs,
+    v0005_read_watermarks,
+    v0006_microsecond_timestamps,
+    v0007_inbox_order,
+)
+from api.utils.helpers import utcnow
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    v0001_initial_schema,
+    v0002_chat_indexes,
+    v0003_private_chat_summaries,
+    v0004_canonical_chat_pairs,
+    v0005_read_watermarks,
+    v0006_microsecond_timestamps,
+    v0007_inbox_order,
+]
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def applied_versions(connection: Connection) -> List[int]:
+    schema_version.create(connection, checkfirst=True)
+    return list(connection.scalars(select(schema_version.c.version)))
+
+
+def upgrade(engine: Optional[Engine] = None) -> List[int]:
+    """Apply pending migrations in one transaction; returns their versions"""
+    if engine is None:
+        from api.database import engine
+
+    applied = []
+    with engine.begin() as connection:
+        done = set(applied_versions(connection))
+        for migration in MIGRATIONS:
+            if migration.VERSION in done:
+                continue
+            logger.info(
+                "Applying migration %04d: %s", migration.VERSION, migration.DESCRIPTION
+            )
+            migration.upgrade(connection)
+            connection.execute(
+                schema_version.insert().values(
+                    version=migration.VERSION,
+                    description=migration.DESCRIPTION,
+                    applied_at=utcnow(),
+                )
+            )
+            applied.append(migration.VERSION)
+    return applied
@@ -0,0 +1,41 @@
+"""Run with: python -m api.migrations [upgrade|status|check-plans]"""
+
+import argparse
+import sys
+
+from api.migrations import MIGRATIONS, applied_versions, upgrade
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the database schema")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="upgrade",
+        choices=["upgrade", "status", "check-plans"],
+    )
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade()
+        print(f"Applied {applied}" if applied else "Schema is up to date")
+
+    elif args.command == "status":
+        from api.database import engine
+
+        with engine.begin() as connection:
+            done = set(applied_versions(connection))
+        for migration in MIGRATIONS:
+            mark = "x" if migration.VERSION in done else " "
+            print(f"[{mark}] {migration.VERSION:04d} {migration.DESCRIPTION}")
+
+    else:
+        from api.migrations.plans import check
+
+        failures = check()
+        if failures:
+            sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
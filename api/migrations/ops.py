@@ -0,0 +1,52 @@
+from typing import List
+
+from sqlalchemy import Column, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+
+def has_table(connection: Connection, table: str) -> bool:
+    return inspect(connection).has_table(table)
+
+
+def has_column(connection: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(connection).get_columns(table))
+
+
+def has_index(connection: Connection, table: str, name: str) -> bool:
+    return any(i["name"] == name for i in inspect(connection).get_indexes(table))
+
+
+def create_index(
+    connection: Connection,
+    name: str,
+    table: str,
+    columns: List[str],
+    unique: bool = False,
+):
+    if not has_index(connection, table, name):
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        connection.execute(
+            text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+        )
+
+
+def drop_index(connection: Connection, name: str, table: str):
+    if has_index(connection, table, name):
+        if connection.dialect.name == "mysql":
+            connection.execute(text(f"DROP INDEX {name} ON {table}"))
+        else:
+            connection.execute(text(f"DROP INDEX {name}"))
+
+
+def add_column(connection: Connection, table: str, column: Column):
+    """Add ``column`` (name, type, nullability; no constraints) if missing"""
+    if not has_column(connection, table, column.name):
+        spec = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {spec}"))
+
+
+def drop_column(connection: Connection, table: str, column: str):
+    """Drop ``column`` if present; indexes on it must go first. SQLite 3.35+"""
+    if has_column(connection, table, column):
+        connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
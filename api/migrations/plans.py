@@ -0,0 +1,107 @@
+"""EXPLAIN QUERY PLAN checks: each hot router query must use its index.
+
+The statements come from the same builders the routers and services call,
+with sample arguments. They are explained against a fresh in-memory SQLite
+database migrated to the latest version, so a missing index or a query
+rewrite that stops using one fails loudly. ``tests/test_query_plans.py``
+runs the same checks under pytest.
+"""
+
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import Executable
+
+from api.migrations import upgrade
+from api.models.message import Message
+from api.models.chat import PrivateMessage
+from api.utils.pagination import encode_cursor, keyset_query
+
+SENT_AT = datetime(2024, 5, 2, 21, 14, 7, 512344)
+CURSOR = encode_cursor(SENT_AT, 4821)
+
+
+def hot_queries() -> List[Tuple[str, Executable, str]]:
+    """(description, statement, index it must use)"""
+    from api.routers import messages, moderation, private_chats
+    from api.services.chat_summaries import mark_read_statement
+    from api.services.private_chat_service import chat_id_query
+
+    return [
+        (
+            "room history, first page",
+            keyset_query(messages.history_query(), Message, 50),
+            "ix_messages_created_at_id",
+        ),
+        (
+            "room history, next page",
+            keyset_query(messages.history_query(), Message, 50, CURSOR),
+            "ix_messages_created_at_id",
+        ),
+        (
+            "room history, before a date",
+            keyset_query(messages.history_query(SENT_AT), Message, 50),
+            "ix_messages_created_at_id",
+        ),
+        (
+            "private history, next page",
+            keyset_query(private_chats.history_query(7), PrivateMessage, 50, CURSOR),
+            "ix_private_messages_chat_created",
+        ),
+        (
+            "mark chat read",
+            mark_read_statement(7, 3),
+            # The composite primary key
+            "sqlite_autoindex_private_chat_summaries_1",
+        ),
+        (
+            "chat between two users",
+            chat_id_query((3, 5)),
+            "ux_private_chats_pair",
+        ),
+        (
+            "inbox",
+            private_chats.inbox_query(3),
+            "ix_private_chat_summaries_inbox",
+        ),
+        (
+            "moderation log",
+            moderation.logs_query(),
+            "ix_moderation_logs_created_at",
+        ),
+    ]
+
+
+def explain(connection: Connection, statement: Executable) -> List[str]:
+    sql = statement.compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+    )
+    return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def plan_problem(plan: List[str], index: str) -> Optional[str]:
+    """Why ``plan`` is not good enough for a hot query, or None"""
+    if not any(index in step for step in plan):
+        return f"expected {index}, got {plan}"
+    if any("TEMP B-TREE" in step for step in plan):
+        return f"sorts outside the index: {plan}"
+    return None
+
+
+def check() -> List[str]:
+    """Explain every hot query; returns a description of each failure"""
+    engine = create_engine("sqlite://")
+    upgrade(engine)
+    failures = []
+    with engine.connect() as connection:
+        for description, statement, index in hot_queries():
+            plan = explain(connection, statement)
+            problem = plan_problem(plan, index)
+            status = "FAIL" if problem else "ok"
+            print(f"{status:<4} {description:<28} {' | '.join(plan)}")
+            if problem:
+                failures.append(f"{description}: {problem}")
+    engine.dispose()
+    return failures
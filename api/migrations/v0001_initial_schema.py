@@ -0,0 +1,100 @@
+"""The schema as create_all built it before migrations existed.
+
+Tables are declared here rather than taken from the models, so this step
+keeps creating the same thing however the models change later. Databases
+that already have the tables are left as they are.
+"""
+
+from sqlalchemy import (
+    JSON,
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import func
+
+from api.models.message import MessageType
+from api.models.user import UserStatus
+
+VERSION = 1
+DESCRIPTION = "Initial chat schema"
+
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("nickname", String(20), unique=True, index=True, nullable=False),
+    Column("age_group", String(20), nullable=False),
+    Column("avatar", String(500)),
+    Column("chat_color", String(7)),
+    Column("roles", JSON),
+    Column("previous_nicknames", JSON),
+    Column("status", Enum(UserStatus)),
+    Column("settings", JSON),
+    Column("is_active", Boolean),
+    Column("is_banned", Boolean),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+    Column("last_seen", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "messages",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("nickname", String(20), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("message_type", Enum(MessageType)),
+    Column("embed_data", JSON),
+    Column("file_data", JSON),
+    Column("target_user", String(20)),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "private_chats",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user1_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("user2_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "private_messages",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("chat_id", Integer, ForeignKey("private_chats.id"), nullable=False),
+    Column("sender_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("embed_data", JSON),
+    Column("file_data", JSON),
+    Column("is_read", Integer),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+Table(
+    "moderation_logs",
+    metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("action", String(20), nullable=False),
+    Column("target_user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("moderator_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("reason", Text),
+    Column("duration", Integer),
+    Column("created_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+
+def upgrade(connection: Connection):
+    metadata.create_all(connection, checkfirst=True)
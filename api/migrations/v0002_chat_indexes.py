@@ -0,0 +1,36 @@
+"""Composite indexes for the history, inbox and moderation log queries"""
+
+from sqlalchemy.engine import Connection
+
+from api.migrations.ops import create_index, has_column
+
+VERSION = 2
+DESCRIPTION = "Composite indexes for hot chat queries"
+
+INDEXES = [
+    # Keyset pages of the room history, newest first
+    ("ix_messages_created_at_id", "messages", ["created_at", "id"]),
+    # Keyset pages of one private conversation
+    (
+        "ix_private_messages_chat_created",
+        "private_messages",
+        ["chat_id", "created_at", "id"],
+    ),
+    # Unread counts per conversation, answered from the index alone. Not
+    # created on databases built from later models, which have no is_read
+    (
+        "ix_private_messages_chat_unread",
+        "private_messages",
+        ["chat_id", "sender_id", "is_read"],
+    ),
+    # Finding the chat between two users, from either side
+    ("ix_private_chats_users", "private_chats", ["user1_id", "user2_id"]),
+    ("ix_private_chats_user2", "private_chats", ["user2_id"]),
+    ("ix_moderation_logs_created_at", "moderation_logs", ["created_at"]),
+]
+
+
+def upgrade(connection: Connection):
+    for name, table, columns in INDEXES:
+        if all(has_column(connection, table, column) for column in columns):
+            create_index(connection, name, table, columns)
@@ -0,0 +1,91 @@
+"""Per-participant private chat summaries, backfilled from existing chats"""
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    desc,
+    func,
+    select,
+    table,
+    column,
+)
+from sqlalchemy.engine import Connection
+
+from api.migrations.ops import has_table
+
+VERSION = 3
+DESCRIPTION = "Private chat summaries for the inbox"
+
+metadata = MetaData()
+
+# Foreign key targets, declared so the summaries table can be created alone
+for name in ("users", "private_chats", "private_messages"):
+    Table(name, metadata, Column("id", Integer, primary_key=True))
+
+summaries = Table(
+    "private_chat_summaries",
+    metadata,
+    Column("chat_id", Integer, ForeignKey("private_chats.id"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("other_user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("last_message_id", Integer, ForeignKey("private_messages.id")),
+    Column("last_sender_id", Integer, ForeignKey("users.id")),
+    Column("last_content", Text),
+    Column("last_message_at", DateTime(timezone=True)),
+    Column("unread_count", Integer, nullable=False),
+    Index("ix_private_chat_summaries_inbox", "user_id", "last_message_at"),
+)
+
+# Only the columns the backfill reads, as they were at this version
+chats = table("private_chats", column("id"), column("user1_id"), column("user2_id"))
+messages = table(
+    "private_messages",
+    column("id"),
+    column("chat_id"),
+    column("sender_id"),
+    column("content"),
+    column("is_read", Integer),
+    column("created_at", DateTime(timezone=True)),
+)
+
+
+def upgrade(connection: Connection):
+    if has_table(connection, summaries.name):
+        return
+    summaries.create(connection)
+
+    for chat_id, user1_id, user2_id in connection.execute(select(chats)):
+        last = connection.execute(
+            select(messages)
+            .where(messages.c.chat_id == chat_id)
+            .order_by(desc(messages.c.created_at), desc(messages.c.id))
+            .limit(1)
+        ).first()
+        for user_id, other_user_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            unread = connection.scalar(
+                select(func.count())
+                .select_from(messages)
+                .where(
+                    messages.c.chat_id == chat_id,
+                    messages.c.sender_id != user_id,
+                    messages.c.is_read == 0,
+                )
+            )
+            connection.execute(
+                summaries.insert().values(
+                    chat_id=chat_id,
+                    user_id=user_id,
+                    other_user_id=other_user_id,
+                    last_message_id=last.id if last else None,
+                    last_sender_id=last.sender_id if last else None,
+                    last_content=last.content if last else None,
+                    last_message_at=last.created_at if last else None,
+                    unread_count=unread,
+                )
+            )
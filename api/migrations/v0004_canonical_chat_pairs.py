@@ -0,0 +1,123 @@
+"""Store each private chat once, as (lower user ID, higher user ID).
+
+Rows saved the other way round are flipped. Chats that turn out to be
+duplicates of an older one are merged into it: their messages move over,
+and the older chat's summaries are rebuilt from the combined history. A
+unique index on the pair then replaces the plain lookup index.
+"""
+
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    column,
+    delete,
+    desc,
+    func,
+    insert,
+    select,
+    table,
+    update,
+)
+from sqlalchemy.engine import Connection
+
+from api.migrations.ops import create_index, drop_index
+
+VERSION = 4
+DESCRIPTION = "Canonical private chat pairs under a unique index"
+
+# Only the columns this step touches, as they were at this version
+chats = table("private_chats", column("id"), column("user1_id"), column("user2_id"))
+messages = table(
+    "private_messages",
+    column("id"),
+    column("chat_id"),
+    column("sender_id"),
+    column("content"),
+    column("is_read", Integer),
+    column("created_at", DateTime(timezone=True)),
+)
+summaries = table(
+    "private_chat_summaries",
+    column("chat_id"),
+    column("user_id"),
+    column("other_user_id"),
+    column("last_message_id"),
+    column("last_sender_id"),
+    column("last_content"),
+    column("last_message_at", DateTime(timezone=True)),
+    column("unread_count"),
+)
+
+
+def upgrade(connection: Connection):
+    kept = {}
+    merged = set()
+    rows = connection.execute(select(chats).order_by(chats.c.id)).all()
+    for chat_id, user1_id, user2_id in rows:
+        pair = (min(user1_id, user2_id), max(user1_id, user2_id))
+        if pair not in kept:
+            kept[pair] = chat_id
+            if pair != (user1_id, user2_id):
+                # Explicit values, not a column swap: MySQL applies SET in order
+                connection.execute(
+                    update(chats)
+                    .where(chats.c.id == chat_id)
+                    .values(user1_id=pair[0], user2_id=pair[1])
+                )
+            continue
+
+        keeper = kept[pair]
+        connection.execute(
+            update(messages).where(messages.c.chat_id == chat_id).values(chat_id=keeper)
+        )
+        connection.execute(delete(summaries).where(summaries.c.chat_id == chat_id))
+        connection.execute(delete(chats).where(chats.c.id == chat_id))
+        merged.add((keeper, pair))
+
+    for chat_id, (user1_id, user2_id) in merged:
+        connection.execute(delete(summaries).where(summaries.c.chat_id == chat_id))
+        summarize(connection, chat_id, user1_id, user2_id)
+
+    drop_index(connection, "ix_private_chats_users", "private_chats")
+    create_index(
+        connection,
+        "ux_private_chats_pair",
+        "private_chats",
+        ["user1_id", "user2_id"],
+        unique=True,
+    )
+
+
+def summarize(connection: Connection, chat_id: int, user1_id: int, user2_id: int):
+    """Insert the summaries of one merged chat from its combined messages.
+
+    A chat with oneself gets a single row.
+    """
+    last = connection.execute(
+        select(messages)
+        .where(messages.c.chat_id == chat_id)
+        .order_by(desc(messages.c.created_at), desc(messages.c.id))
+        .limit(1)
+    ).first()
+    for user_id, other_user_id in {(user1_id, user2_id), (user2_id, user1_id)}:
+        unread = connection.scalar(
+            select(func.count())
+            .select_from(messages)
+            .where(
+                messages.c.chat_id == chat_id,
+                messages.c.sender_id != user_id,
+                messages.c.is_read == 0,
+            )
+        )
+        connection.execute(
+            insert(summaries).values(
+                chat_id=chat_id,
+                user_id=user_id,
+                other_user_id=other_user_id,
+                last_message_id=last.id if last else None,
+                last_sender_id=last.sender_id if last else None,
+                last_content=last.content if last else None,
+                last_message_at=last.created_at if last else None,
+                unread_count=unread,
+            )
+        )
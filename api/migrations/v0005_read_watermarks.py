@@ -0,0 +1,72 @@
+"""Per-participant read watermarks replace the per-message is_read flag"""
+
+from sqlalchemy import Column, Integer, case, column, func, select, table, update
+from sqlalchemy.engine import Connection
+
+from api.migrations.ops import add_column, drop_column, drop_index, has_column
+
+VERSION = 5
+DESCRIPTION = "Read watermarks on private chat summaries"
+
+# Only the columns the backfill reads, as they were at this version
+summaries = table(
+    "private_chat_summaries",
+    column("chat_id"),
+    column("user_id"),
+    column("last_message_id"),
+    column("last_read_message_id"),
+    column("unread_count"),
+)
+messages = table(
+    "private_messages",
+    column("id"),
+    column("chat_id"),
+    column("sender_id"),
+    column("is_read", Integer),
+)
+
+
+def upgrade(connection: Connection):
+    if not has_column(connection, summaries.name, "last_read_message_id"):
+        add_column(connection, summaries.name, Column("last_read_message_id", Integer))
+        if has_column(connection, messages.name, "is_read"):
+            backfill(connection)
+
+    drop_index(connection, "ix_private_messages_chat_unread", messages.name)
+    drop_column(connection, messages.name, "is_read")
+
+
+def backfill(connection: Connection):
+    """Each reader's watermark: the last message before the first unread one.
+
+    Fully read chats are read up to their latest message; the maintained
+    unread counts stay as they are.
+    """
+    unread = messages.alias("unread")
+    first_unread = (
+        select(func.min(unread.c.id))
+        .where(
+            unread.c.chat_id == summaries.c.chat_id,
+            unread.c.sender_id != summaries.c.user_id,
+            unread.c.is_read == 0,
+        )
+        .correlate(summaries)
+        .scalar_subquery()
+    )
+    read_before = (
+        select(func.max(messages.c.id))
+        .where(
+            messages.c.chat_id == summaries.c.chat_id,
+            messages.c.id < first_unread,
+        )
+        .correlate(summaries)
+        .scalar_subquery()
+    )
+    connection.execute(
+        update(summaries).values(
+            last_read_message_id=case(
+                (summaries.c.unread_count == 0, summaries.c.last_message_id),
+                else_=read_before,
+            )
+        )
+    )
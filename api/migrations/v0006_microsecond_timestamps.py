@@ -0,0 +1,32 @@
+"""Rewrite second-precision SQLite timestamps in the keyset-paged tables.
+
+Rows inserted before created_at got a Python default carry SQLite's
+``CURRENT_TIMESTAMP`` text, ``2024-05-02 21:14:07``. Cursors bind
+``2024-05-02 21:14:07.000000``, which sorts after it as text, so such a row
+would satisfy the "older than the cursor" test and come back on every page.
+Other databases store real timestamps and are left alone.
+"""
+
+from sqlalchemy import String, column, func, table, update
+from sqlalchemy.engine import Connection
+
+VERSION = 6
+DESCRIPTION = "Microsecond created_at text in paged SQLite tables"
+
+# created_at read as text, the way SQLite stores it
+TABLES = [
+    table(name, column("created_at", String))
+    for name in ("messages", "private_messages")
+]
+
+
+def upgrade(connection: Connection):
+    if connection.dialect.name != "sqlite":
+        return
+    for paged in TABLES:
+        created_at = paged.c.created_at
+        connection.execute(
+            update(paged)
+            .where(func.length(created_at) == len("2024-05-02 21:14:07"))
+            .values(created_at=created_at + ".000000")
+        )
@@ -0,0 +1,26 @@
+"""Rebuild the inbox index in the order the inbox is read.
+
+The inbox lists a user's chats newest first with chats that have no
+messages yet (``last_message_at`` NULL) at the end, and ``chat_id`` breaks
+ties. Postgres sorts NULLs first in a descending scan of an ascending index,
+so there the index spells the order out; SQLite and MySQL already put NULLs
+last under DESC and scan a plain index backwards.
+"""
+
+from sqlalchemy.engine import Connection
+
+from api.migrations.ops import create_index, drop_index
+
+VERSION = 7
+DESCRIPTION = "Inbox index ordered with empty chats last"
+
+INDEX = "ix_private_chat_summaries_inbox"
+TABLE = "private_chat_summaries"
+
+
+def upgrade(connection: Connection):
+    columns = ["user_id", "last_message_at", "chat_id"]
+    if connection.dialect.name == "postgresql":
+        columns = ["user_id", "last_message_at DESC NULLS LAST", "chat_id DESC"]
+    drop_index(connection, INDEX, TABLE)
+    create_index(connection, INDEX, TABLE, columns)
@@ -1,11 +1,30 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, Text
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    JSON,
+    ForeignKey,
+    Index,
+    Text,
+)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from api.database import Base
+from api.utils.helpers import utcnow
 
 
 class PrivateChat(Base):
+    """A conversation between two users, stored once per pair.
+
+    ``user1_id`` is always the lower of the two IDs; see ``chat_pair``.
+    """
+
     __tablename__ = "private_chats"
+    __table_args__ = (
+        Index("ux_private_chats_pair", "user1_id", "user2_id", unique=True),
+        Index("ix_private_chats_user2", "user2_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -18,6 +37,9 @@ class PrivateChat(Base):
 
 class PrivateMessage(Base):
     __tablename__ = "private_messages"
+    __table_args__ = (
+        Index("ix_private_messages_chat_created", "chat_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chat_id = Column(Integer, ForeignKey("private_chats.id"), nullable=False)
@@ -25,18 +47,66 @@ class PrivateMessage(Base):
     content = Column(Text, nullable=False)
     embed_data = Column(JSON)
     file_data = Column(JSON)
-    is_read = Column(Integer, default=0)  # Bitmask for read status
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now()
+    )
 
     chat = relationship("PrivateChat")
     sender = relationship("User")
 
     def to_dict(self):
-        return {
-            "id": str(self.id),
-            "sender": self.sender.nickname if self.sender else "",
-            "content": self.content,
-            "timestamp": self.created_at.isoformat() if self.created_at else None,
-            "embedData": self.embed_data,
-            "fileData": self.file_data,
-        }
+        return private_message_dict(self, self.sender.nickname if self.sender else "")
+
+
+class PrivateChatSummary(Base):
+    """One participant's view of a private chat, kept current on every write.
+
+    Updated in the same transaction as each message send and read, so the
+    inbox is a single indexed query instead of per-chat lookups.
+    """
+
+    __tablename__ = "private_chat_summaries"
+    __table_args__ = (
+        Index(
+            "ix_private_chat_summaries_inbox",
+            "user_id",
+            "last_message_at",
+            "chat_id",
+            postgresql_ops={"last_message_at": "DESC NULLS LAST", "chat_id": "DESC"},
+        ),
+    )
+
+    chat_id = Column(Integer, ForeignKey("private_chats.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    other_user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    last_message_id = Column(Integer, ForeignKey("private_messages.id"))
+    last_sender_id = Column(Integer, ForeignKey("users.id"))
+    last_content = Column(Text)
+    last_message_at = Column(DateTime(timezone=True))
+    unread_count = Column(Integer, nullable=False, default=0)
+    # Newest message this participant has read; no foreign key, so the
+    # watermark outlives the message it points at
+    last_read_message_id = Column(Integer)
+
+
+# Columns private_message_dict reads; select them with the sender's
+# nickname (labelled "sender") to list history without loading entities
+PRIVATE_MESSAGE_COLUMNS = (
+    PrivateMessage.id,
+    PrivateMessage.content,
+    PrivateMessage.created_at,
+    PrivateMessage.embed_data,
+    PrivateMessage.file_data,
+)
+
+
+def private_message_dict(message, sender: str) -> dict:
+    """API fields of a PrivateMessage or a PRIVATE_MESSAGE_COLUMNS row"""
+    return {
+        "id": str(message.id),
+        "sender": sender,
+        "content": message.content,
+        "timestamp": message.created_at.isoformat() if message.created_at else None,
+        "embedData": message.embed_data,
+        "fileData": message.file_data,
+    }
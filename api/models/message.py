@@ -1,7 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Enum, ForeignKey, Text
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    JSON,
+    Enum,
+    ForeignKey,
+    Index,
+    Text,
+)
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from api.database import Base
+from api.utils.helpers import utcnow
 import enum
 
 
@@ -14,6 +25,7 @@ class MessageType(str, enum.Enum):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (Index("ix_messages_created_at_id", "created_at", "id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -23,18 +35,40 @@ class Message(Base):
     embed_data = Column(JSON)
     file_data = Column(JSON)
     target_user = Column(String(20))  # For whispers
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set in Python so every row has microseconds and sorts with its cursor
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now()
+    )
 
     user = relationship("User")
 
     def to_dict(self):
-        return {
-            "id": str(self.id),
-            "nickname": self.nickname,
-            "content": self.content,
-            "timestamp": self.created_at.isoformat() if self.created_at else None,
-            "type": self.message_type.value if self.message_type else "message",
-            "embedData": self.embed_data,
-            "fileData": self.file_data,
-            "targetUser": self.target_user,
-        }
+        return message_dict(self)
+
+
+# What list endpoints select instead of whole entities, so no ORM objects
+# are built just to be turned into dicts
+MESSAGE_COLUMNS = (
+    Message.id,
+    Message.nickname,
+    Message.content,
+    Message.created_at,
+    Message.message_type,
+    Message.embed_data,
+    Message.file_data,
+    Message.target_user,
+)
+
+
+def message_dict(message) -> dict:
+    """API fields of a Message, or of a row selected with MESSAGE_COLUMNS"""
+    return {
+        "id": str(message.id),
+        "nickname": message.nickname,
+        "content": message.content,
+        "timestamp": message.created_at.isoformat() if message.created_at else None,
+        "type": message.message_type.value if message.message_type else "message",
+        "embedData": message.embed_data,
+        "fileData": message.file_data,
+        "targetUser": message.target_user,
+    }
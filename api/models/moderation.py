@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from api.database import Base
@@ -6,6 +6,7 @@ from api.database import Base
 
 class ModerationLog(Base):
     __tablename__ = "moderation_logs"
+    __table_args__ = (Index("ix_moderation_logs_created_at", "created_at"),)
 
     id = Column(Integer, primary_key=True, index=True)
     action = Column(String(20), nullable=False)  # kick, ban, whitelist, mute
@@ -19,12 +20,31 @@ class ModerationLog(Base):
     moderator = relationship("User", foreign_keys=[moderator_id])
 
     def to_dict(self):
-        return {
-            "id": str(self.id),
-            "action": self.action,
-            "targetUser": self.target_user.nickname if self.target_user else "",
-            "moderator": self.moderator.nickname if self.moderator else "",
-            "reason": self.reason,
-            "duration": self.duration,
-            "timestamp": self.created_at.isoformat() if self.created_at else None,
-        }
+        return moderation_log_dict(
+            self,
+            self.target_user.nickname if self.target_user else "",
+            self.moderator.nickname if self.moderator else "",
+        )
+
+
+# Columns moderation_log_dict reads; the logs page selects them with both
+# nicknames instead of loading each log and its two users
+MODERATION_LOG_COLUMNS = (
+    ModerationLog.id,
+    ModerationLog.action,
+    ModerationLog.reason,
+    ModerationLog.duration,
+    ModerationLog.created_at,
+)
+
+
+def moderation_log_dict(log, target_user: str, moderator: str) -> dict:
+    return {
+        "id": str(log.id),
+        "action": log.action,
+        "targetUser": target_user,
+        "moderator": moderator,
+        "reason": log.reason,
+        "duration": log.duration,
+        "timestamp": log.created_at.isoformat() if log.created_at else None,
+    }
@@ -44,18 +44,7 @@ class User(Base):
     last_seen = Column(DateTime(timezone=True), server_default=func.now())
 
     def to_dict(self):
-        return {
-            "id": str(self.id),
-            "nickname": self.nickname,
-            "ageGroup": self.age_group,
-            "avatar": self.avatar,
-            "chatColor": self.chat_color,
-            "roles": self.roles or ["Member"],
-            "previousNicknames": self.previous_nicknames or [],
-            "status": self.status.value if self.status else "online",
-            "joinedAt": self.created_at.isoformat() if self.created_at else None,
-            "lastSeen": self.last_seen.isoformat() if self.last_seen else None,
-        }
+        return user_dict(self)
 
     # Add secret (only known to db and API during validation)
     # Method for frontend-facing usage
@@ -65,3 +54,34 @@ class User(Base):
     #         'id': self.id,
     #         'nickname': self.nickname
     #     }
+
+
+# Columns user_dict reads, for listing users without loading entities
+USER_COLUMNS = (
+    User.id,
+    User.nickname,
+    User.age_group,
+    User.avatar,
+    User.chat_color,
+    User.roles,
+    User.previous_nicknames,
+    User.status,
+    User.created_at,
+    User.last_seen,
+)
+
+
+def user_dict(user) -> dict:
+    """Public fields of a User, or of a row selected with USER_COLUMNS"""
+    return {
+        "id": str(user.id),
+        "nickname": user.nickname,
+        "ageGroup": user.age_group,
+        "avatar": user.avatar,
+        "chatColor": user.chat_color,
+        "roles": user.roles or ["Member"],
+        "previousNicknames": user.previous_nicknames or [],
+        "status": user.status.value if user.status else "online",
+        "joinedAt": user.created_at.isoformat() if user.created_at else None,
+        "lastSeen": user.last_seen.isoformat() if user.last_seen else None,
+    }
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List, Optional
 import random
@@ -20,7 +20,7 @@ class AskAIRequest(BaseModel):
 @router.post("/ask")
 async def ask_ai(
     request: AskAIRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if len(request.question.strip()) == 0:
@@ -44,7 +44,7 @@ async def ask_ai(
 @router.get("/conversation/{user_id}")
 async def get_ai_conversation(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     # In a real implementation, you'd store AI conversations
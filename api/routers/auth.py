@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 import random
@@ -7,6 +7,8 @@ from typing import Literal
 from api.database import get_db
 from api.models.user import User, UserStatus
 from api.services.auth_service import create_access_token, get_current_user
+from api.services.user_resolver import forget_nickname, resolve_user
+from api.services.websocket_manager import websocket_manager
 from api.utils.helpers import generate_avatar_url, get_random_chat_color
 import logging
 
@@ -31,12 +33,12 @@ class LoginResponse(BaseModel):
 
 
 @router.post("/login", response_model=dict)
-async def login(request: LoginRequest, db: Session = Depends(get_db)):
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_db)):
     """Login method
 
     Args:
         request (LoginRequest): Payload containing nickname and ageGroup
-        db (Session, optional): db session. Defaults to Depends(get_db).
+        db (AsyncSession, optional): db session. Defaults to Depends(get_db).
 
     Raises:
         HTTPException: HTTP 400 with description of the error
@@ -58,7 +60,9 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         )
 
     # Check if nickname is already taken
-    user = db.query(User).filter(User.nickname == request.nickname.strip()).first()
+    # Ask the database: another worker may have registered the name since
+    forget_nickname(request.nickname.strip())
+    user = await resolve_user(db, request.nickname.strip())
     if user:
         logger.error("Nickname already in database")
         # TODO: Handle same user wishes to re-join under different nickname
@@ -107,8 +111,10 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
         )
 
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
+        # Clears cached lookups of the name and bumps user list versions
+        await websocket_manager.refresh_user(user)
 
     # Create JWT token
     token = create_access_token(data={"sub": str(user.id), "nickname": user.nickname})
@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 
 from api.database import get_db
 from api.models.user import User
-from api.models.message import Message, MessageType
+from api.models.message import MESSAGE_COLUMNS, Message, MessageType, message_dict
 from api.services.auth_service import get_current_user
+from api.services.history import room_history
+from api.services.versions import not_modified
+from api.services.ingest import message_ingest
+from api.utils.pagination import keyset_page
+from api.utils.serialization import json_response
 from api.services.websocket_manager import websocket_manager
 
 router = APIRouter()
@@ -20,10 +25,20 @@ class SendMessageRequest(BaseModel):
     targetUser: Optional[str] = None
 
 
+def history_query(before: Optional[datetime] = None):
+    """Room history, newest first once paged; only the columns the response needs"""
+    query = select(*MESSAGE_COLUMNS).where(
+        Message.message_type.in_([MessageType.MESSAGE, MessageType.SYSTEM])
+    )
+    if before is not None:
+        query = query.where(Message.created_at < before)
+    return query
+
+
 @router.post("")
 async def send_message(
     request: SendMessageRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if len(request.content.strip()) == 0:
@@ -41,58 +56,69 @@ async def send_message(
                 status_code=400, detail="Target user required for whisper"
             )
 
-    # Create message
-    message = Message(
-        user_id=current_user.id,
-        nickname=current_user.nickname,
-        content=request.content.strip(),
-        message_type=message_type,
-        target_user=request.targetUser,
+    # Create message, in one commit with others sent in the same few ms
+    message = await message_ingest.submit(
+        {
+            "user_id": current_user.id,
+            "nickname": current_user.nickname,
+            "content": request.content.strip(),
+            "message_type": message_type,
+            "target_user": request.targetUser,
+        }
     )
-
-    db.add(message)
-    db.commit()
-    db.refresh(message)
+    message_data = message.to_dict()
 
     # Broadcast message via WebSocket
-    await websocket_manager.broadcast_message(
-        {"type": "message", "data": message.to_dict()}
-    )
+    await websocket_manager.broadcast_message({"type": "message", "data": message_data})
 
-    return {"success": True, "data": message.to_dict()}
+    return {"success": True, "data": message_data}
 
 
 @router.get("")
 async def get_messages(
-    limit: int = Query(50, le=100),
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     offset: int = Query(0, ge=0),
     before: Optional[str] = None,
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, alias="includeTotal"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    query = db.query(Message).filter(
-        Message.message_type.in_([MessageType.MESSAGE, MessageType.SYSTEM])
-    )
+    cached = not_modified(request, response, "messages")
+    if cached:
+        return cached
 
+    before_date = None
     if before:
         try:
             before_date = datetime.fromisoformat(before.replace("Z", "+00:00"))
-            query = query.filter(Message.created_at < before_date)
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date format")
-
-    messages = (
-        query.order_by(desc(Message.created_at)).offset(offset).limit(limit).all()
+    query = history_query(before_date)
+
+    if not (cursor or offset or before or include_total):
+        # The newest page, from memory when the window covers it
+        if not room_history.loaded:
+            await room_history.load(db, query, Message, message_dict)
+        page = room_history.page(limit)
+        if page is not None:
+            page.headers["ETag"] = response.headers["ETag"]
+            return page
+
+    try:
+        messages, pagination = await keyset_page(
+            db, query, Message, limit, cursor, include_total, offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return json_response(
+        {
+            "success": True,
+            "data": [message_dict(message) for message in messages],
+            "pagination": pagination,
+        },
+        response,
     )
-
-    # Reverse to get chronological order
-    messages.reverse()
-
-    total = query.count()
-    has_more = offset + limit < total
-
-    return {
-        "success": True,
-        "data": [message.to_dict() for message in messages],
-        "pagination": {"total": total, "hasMore": has_more},
-    }
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel
 from typing import Optional
 
 from api.database import get_db
 from api.models.user import User
-from api.models.moderation import ModerationLog
+from api.models.moderation import (
+    MODERATION_LOG_COLUMNS,
+    ModerationLog,
+    moderation_log_dict,
+)
 from api.services.auth_service import get_current_user
+from api.services.user_resolver import get_user_or_404
+from api.services.versions import not_modified
 from api.services.websocket_manager import websocket_manager
+from api.utils.serialization import json_response
 
 router = APIRouter()
 
@@ -29,14 +38,12 @@ def check_moderation_permission(current_user: User, action: str):
 @router.post("/kick")
 async def kick_user(
     request: ModerationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     check_moderation_permission(current_user, "kick")
 
-    target_user = db.query(User).filter(User.nickname == request.username).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    target_user = await get_user_or_404(db, request.username)
 
     if "Admin" in target_user.roles:
         raise HTTPException(status_code=403, detail="Cannot kick an admin")
@@ -49,7 +56,8 @@ async def kick_user(
         reason=request.reason,
     )
     db.add(log)
-    db.commit()
+    await db.commit()
+    await websocket_manager.publish_change("moderation_logs")
 
     # Broadcast moderation action
     await websocket_manager.broadcast_message(
@@ -70,14 +78,12 @@ async def kick_user(
 @router.post("/ban")
 async def ban_user(
     request: ModerationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     check_moderation_permission(current_user, "ban")
 
-    target_user = db.query(User).filter(User.nickname == request.username).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    target_user = await get_user_or_404(db, request.username)
 
     if "Admin" in target_user.roles:
         raise HTTPException(status_code=403, detail="Cannot ban an admin")
@@ -95,7 +101,11 @@ async def ban_user(
         duration=request.duration,
     )
     db.add(log)
-    db.commit()
+    await db.commit()
+    await websocket_manager.publish_change("moderation_logs")
+
+    # Close the banned user's sockets
+    await websocket_manager.refresh_user(target_user)
 
     # Broadcast moderation action
     await websocket_manager.broadcast_message(
@@ -116,14 +126,12 @@ async def ban_user(
 @router.post("/whitelist")
 async def whitelist_user(
     request: ModerationRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     check_moderation_permission(current_user, "ban")  # Same permission as ban
 
-    target_user = db.query(User).filter(User.nickname == request.username).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    target_user = await get_user_or_404(db, request.username)
 
     # Unban the user
     target_user.is_banned = False
@@ -137,22 +145,51 @@ async def whitelist_user(
         reason=request.reason,
     )
     db.add(log)
-    db.commit()
+    await db.commit()
+    await websocket_manager.publish_change("moderation_logs")
+    await websocket_manager.refresh_user(target_user)
 
     return {"success": True, "message": "User whitelisted successfully"}
 
 
+def logs_query():
+    """The 50 latest moderation actions with both users' nicknames"""
+    target_user = aliased(User)
+    moderator = aliased(User)
+    return (
+        select(
+            *MODERATION_LOG_COLUMNS,
+            target_user.nickname.label("target_user"),
+            moderator.nickname.label("moderator"),
+        )
+        .outerjoin(target_user, target_user.id == ModerationLog.target_user_id)
+        .outerjoin(moderator, moderator.id == ModerationLog.moderator_id)
+        .order_by(ModerationLog.created_at.desc())
+        .limit(50)
+    )
+
+
 @router.get("/logs")
 async def get_moderation_logs(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
     check_moderation_permission(current_user, "view_logs")
+    cached = not_modified(request, response, "moderation_logs")
+    if cached:
+        return cached
 
-    logs = (
-        db.query(ModerationLog)
-        .order_by(ModerationLog.created_at.desc())
-        .limit(50)
-        .all()
-    )
+    logs = await db.execute(logs_query())
 
-    return {"success": True, "data": [log.to_dict() for log in logs]}
+    return json_response(
+        {
+            "success": True,
+            "data": [
+                moderation_log_dict(log, log.target_user or "", log.moderator or "")
+                for log in logs
+            ],
+        },
+        response,
+    )
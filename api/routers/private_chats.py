@@ -1,13 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, desc
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel
 from typing import Optional
 
 from api.database import get_db
 from api.models.user import User
-from api.models.chat import PrivateChat, PrivateMessage
+from api.models.chat import (
+    PRIVATE_MESSAGE_COLUMNS,
+    PrivateChatSummary,
+    PrivateMessage,
+    private_message_dict,
+)
 from api.services.auth_service import get_current_user
+from api.services.user_resolver import get_user_or_404
+from api.services.versions import not_modified
+from api.services.websocket_manager import websocket_manager
+from api.services.chat_summaries import mark_read, record_message
+from api.services.history import private_history
+from api.services.private_chat_service import find_chat_id, get_or_create_chat_id
+from api.utils.pagination import keyset_page
+from api.utils.serialization import json_response
 
 router = APIRouter()
 
@@ -16,201 +30,170 @@ class SendPrivateMessageRequest(BaseModel):
     content: str
 
 
-@router.get("")
-async def get_private_chats(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
-):
-    chats = (
-        db.query(PrivateChat)
-        .filter(
-            or_(
-                PrivateChat.user1_id == current_user.id,
-                PrivateChat.user2_id == current_user.id,
-            )
+def history_row_dict(row) -> dict:
+    return private_message_dict(row, row.sender or "")
+
+
+def inbox_query(user_id: int, dialect: str = "sqlite"):
+    """One indexed query over the summaries kept current on send and read"""
+    other_user = aliased(User)
+    last_sender = aliased(User)
+    # Chats without messages go last; Postgres would put their NULLs first.
+    # MySQL has no NULLS LAST but, like SQLite, already sorts them there.
+    last_message_at = desc(PrivateChatSummary.last_message_at)
+    if dialect != "mysql":
+        last_message_at = last_message_at.nulls_last()
+    return (
+        select(
+            PrivateChatSummary.unread_count,
+            PrivateChatSummary.last_read_message_id,
+            PrivateChatSummary.last_message_id,
+            PrivateChatSummary.last_content,
+            PrivateChatSummary.last_message_at,
+            other_user.nickname,
+            last_sender.nickname,
         )
-        .all()
+        .join(other_user, other_user.id == PrivateChatSummary.other_user_id)
+        .outerjoin(last_sender, last_sender.id == PrivateChatSummary.last_sender_id)
+        .where(PrivateChatSummary.user_id == user_id)
+        .order_by(last_message_at, desc(PrivateChatSummary.chat_id))
     )
 
-    chat_list = []
-    for chat in chats:
-        other_user = chat.user2 if chat.user1_id == current_user.id else chat.user1
-
-        # Get last message
-        last_message = (
-            db.query(PrivateMessage)
-            .filter(PrivateMessage.chat_id == chat.id)
-            .order_by(desc(PrivateMessage.created_at))
-            .first()
-        )
 
-        # Count unread messages
-        unread_count = (
-            db.query(PrivateMessage)
-            .filter(
-                PrivateMessage.chat_id == chat.id,
-                PrivateMessage.sender_id != current_user.id,
-                PrivateMessage.is_read == 0,
-            )
-            .count()
-        )
+def history_query(chat_id: int):
+    """One conversation's messages with the sender's nickname"""
+    return (
+        select(*PRIVATE_MESSAGE_COLUMNS, User.nickname.label("sender"))
+        .outerjoin(User, User.id == PrivateMessage.sender_id)
+        .where(PrivateMessage.chat_id == chat_id)
+    )
 
-        chat_data = {"withUser": other_user.nickname, "unreadCount": unread_count}
 
-        if last_message:
+@router.get("")
+async def get_private_chats(
+    db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)
+):
+    rows = await db.execute(inbox_query(current_user.id, db.bind.dialect.name))
+
+    chat_list = []
+    for unread, read_id, last_id, content, sent_at, with_user, sender in rows:
+        chat_data = {
+            "withUser": with_user,
+            "unreadCount": unread,
+            "lastReadMessageId": str(read_id) if read_id is not None else None,
+        }
+
+        if last_id is not None:
             chat_data["lastMessage"] = {
-                "content": last_message.content,
-                "timestamp": last_message.created_at.isoformat(),
-                "sender": last_message.sender.nickname,
+                "content": content,
+                "timestamp": sent_at.isoformat(),
+                "sender": sender or "",
             }
 
         chat_list.append(chat_data)
 
-    return {"success": True, "data": chat_list}
+    return json_response({"success": True, "data": chat_list})
 
 
 @router.get("/{username}/messages")
 async def get_private_messages(
     username: str,
-    limit: int = Query(50, le=100),
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    include_total: bool = Query(False, alias="includeTotal"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    other_user = db.query(User).filter(User.nickname == username).first()
-    if not other_user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Find or create chat
-    chat = (
-        db.query(PrivateChat)
-        .filter(
-            or_(
-                and_(
-                    PrivateChat.user1_id == current_user.id,
-                    PrivateChat.user2_id == other_user.id,
-                ),
-                and_(
-                    PrivateChat.user1_id == other_user.id,
-                    PrivateChat.user2_id == current_user.id,
-                ),
-            )
+    other_user = await get_user_or_404(db, username)
+
+    chat_id = await find_chat_id(db, current_user.id, other_user.id)
+
+    if chat_id is None:
+        pagination = {"hasMore": False, "nextCursor": None}
+        if include_total:
+            pagination["total"] = 0
+        return {"success": True, "data": [], "pagination": pagination}
+
+    cached = not_modified(request, response, f"private_chat:{chat_id}")
+    if cached:
+        return cached
+
+    query = history_query(chat_id)
+    if not (cursor or offset or include_total):
+        window = private_history(chat_id)
+        if not window.loaded:
+            await window.load(db, query, PrivateMessage, history_row_dict)
+        page = window.page(limit)
+        if page is not None:
+            page.headers["ETag"] = response.headers["ETag"]
+            return page
+
+    try:
+        messages, pagination = await keyset_page(
+            db, query, PrivateMessage, limit, cursor, include_total, offset
         )
-        .first()
-    )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if not chat:
-        return {
+    return json_response(
+        {
             "success": True,
-            "data": [],
-            "pagination": {"total": 0, "hasMore": False},
-        }
-
-    messages = (
-        db.query(PrivateMessage)
-        .filter(PrivateMessage.chat_id == chat.id)
-        .order_by(desc(PrivateMessage.created_at))
-        .offset(offset)
-        .limit(limit)
-        .all()
+            "data": [history_row_dict(message) for message in messages],
+            "pagination": pagination,
+        },
+        response,
     )
 
-    # Reverse to get chronological order
-    messages.reverse()
-
-    total = db.query(PrivateMessage).filter(PrivateMessage.chat_id == chat.id).count()
-    has_more = offset + limit < total
-
-    return {
-        "success": True,
-        "data": [message.to_dict() for message in messages],
-        "pagination": {"total": total, "hasMore": has_more},
-    }
-
 
 @router.post("/{username}/messages")
 async def send_private_message(
     username: str,
     request: SendPrivateMessageRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    other_user = db.query(User).filter(User.nickname == username).first()
-    if not other_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    other_user = await get_user_or_404(db, username)
 
     if len(request.content.strip()) == 0:
         raise HTTPException(status_code=400, detail="Message content cannot be empty")
 
-    # Find or create chat
-    chat = (
-        db.query(PrivateChat)
-        .filter(
-            or_(
-                and_(
-                    PrivateChat.user1_id == current_user.id,
-                    PrivateChat.user2_id == other_user.id,
-                ),
-                and_(
-                    PrivateChat.user1_id == other_user.id,
-                    PrivateChat.user2_id == current_user.id,
-                ),
-            )
-        )
-        .first()
-    )
-
-    if not chat:
-        chat = PrivateChat(user1_id=current_user.id, user2_id=other_user.id)
-        db.add(chat)
-        db.commit()
-        db.refresh(chat)
+    chat_id = await get_or_create_chat_id(db, current_user.id, other_user.id)
 
     # Create message
     message = PrivateMessage(
-        chat_id=chat.id, sender_id=current_user.id, content=request.content.strip()
+        chat_id=chat_id,
+        sender_id=current_user.id,
+        sender=current_user,
+        content=request.content.strip(),
     )
 
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.flush()
+    # Same transaction: the inbox never disagrees with the messages
+    await record_message(db, message)
+    await db.commit()
+    await db.refresh(message, ["created_at"])
+    message_data = message.to_dict()
+    await websocket_manager.record_private_message(chat_id, message_data)
 
-    return {"success": True, "data": message.to_dict()}
+    return {"success": True, "data": message_data}
 
 
 @router.put("/{username}/read")
 async def mark_chat_as_read(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    other_user = db.query(User).filter(User.nickname == username).first()
-    if not other_user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Find chat
-    chat = (
-        db.query(PrivateChat)
-        .filter(
-            or_(
-                and_(
-                    PrivateChat.user1_id == current_user.id,
-                    PrivateChat.user2_id == other_user.id,
-                ),
-                and_(
-                    PrivateChat.user1_id == other_user.id,
-                    PrivateChat.user2_id == current_user.id,
-                ),
-            )
-        )
-        .first()
-    )
+    other_user = await get_user_or_404(db, username)
+
+    chat_id = await find_chat_id(db, current_user.id, other_user.id)
 
-    if chat:
-        # Mark messages as read
-        db.query(PrivateMessage).filter(
-            PrivateMessage.chat_id == chat.id,
-            PrivateMessage.sender_id != current_user.id,
-        ).update({"is_read": 1})
-        db.commit()
+    if chat_id is not None:
+        await mark_read(db, chat_id, current_user.id)
+        await db.commit()
 
     return {"success": True, "message": "Chat marked as read"}
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
+from copy import deepcopy
 
 from api.database import get_db
 from api.models.user import User
 from api.services.auth_service import get_current_user
+from api.services.versions import not_modified
+from api.services.websocket_manager import websocket_manager
 
 router = APIRouter()
 
@@ -19,18 +22,26 @@ class SettingsUpdate(BaseModel):
 
 @router.get("")
 async def get_settings(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
+    cached = not_modified(request, response, f"settings:{current_user.id}")
+    if cached:
+        return cached
+
     return {"success": True, "data": current_user.settings or {}}
 
 
 @router.put("")
 async def update_settings(
     settings_update: SettingsUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    current_settings = current_user.settings or {}
+    # A new dict: JSON columns don't see changes made in place
+    current_settings = deepcopy(current_user.settings or {})
 
     # Update settings
     if settings_update.notifications:
@@ -48,6 +59,7 @@ async def update_settings(
         current_settings.setdefault("chat", {}).update(settings_update.chat)
 
     current_user.settings = current_settings
-    db.commit()
+    await db.commit()
+    await websocket_manager.refresh_user(current_user)
 
     return {"success": True, "message": "Settings updated successfully"}
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List
 from datetime import datetime
 
 from api.database import get_db
-from api.models.user import User, UserStatus
+from api.models.user import USER_COLUMNS, User, UserStatus, user_dict
 from api.services.auth_service import get_current_user
+from api.services.user_resolver import get_user_or_404
+from api.services.versions import not_modified
 from api.services.websocket_manager import websocket_manager
+from api.utils.serialization import json_response
 
 router = APIRouter()
 
@@ -19,17 +22,37 @@ class StatusUpdateRequest(BaseModel):
 
 @router.get("")
 async def get_users(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
 ):
-    users = db.query(User).filter(User.is_active == True, User.is_banned == False).all()
+    cached = not_modified(request, response, "users")
+    if cached:
+        return cached
 
-    return {"success": True, "data": {"users": [user.to_dict() for user in users]}}
+    users = await db.execute(
+        select(*USER_COLUMNS).where(User.is_active == True, User.is_banned == False)
+    )
+
+    return json_response(
+        {"success": True, "data": {"users": [user_dict(user) for user in users]}},
+        response,
+    )
+
+
+@router.get("/online")
+async def get_online_users(current_user: User = Depends(get_current_user)):
+    """Versioned snapshot of online users; apply presence diffs from /ws after it"""
+    return Response(
+        content=websocket_manager.presence.snapshot(), media_type="application/json"
+    )
 
 
 @router.put("/status")
 async def update_status(
     request: StatusUpdateRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     try:
@@ -39,10 +62,12 @@ async def update_status(
 
     current_user.status = status
     current_user.last_seen = func.now()
-    db.commit()
+    await db.commit()
+    await websocket_manager.refresh_user(current_user)
 
     # Broadcast status change
-    await websocket_manager.broadcast_message(
+    await websocket_manager.broadcast_status(
+        current_user.nickname,
         {
             "type": "user_status",
             "data": {
@@ -50,7 +75,7 @@ async def update_status(
                 "status": status.value,
                 "lastSeen": datetime.now().isoformat(),
             },
-        }
+        },
     )
 
     return {"success": True, "message": f"Status updated to {status.value}"}
@@ -59,12 +84,10 @@ async def update_status(
 @router.get("/{username}/lastseen")
 async def get_user_last_seen(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user = db.query(User).filter(User.nickname == username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail=f"User '{username}' not found")
+    user = await get_user_or_404(db, username, f"User '{username}' not found")
 
     return {
         "success": True,
@@ -79,12 +102,16 @@ async def get_user_last_seen(
 @router.get("/{username}/profile")
 async def get_user_profile(
     username: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    user = db.query(User).filter(User.nickname == username).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    cached = not_modified(request, response, f"profile:{username}")
+    if cached:
+        return cached
+
+    user = await get_user_or_404(db, username)
 
     return {"success": True, "data": user.to_dict()}
 
@@ -92,12 +119,10 @@ async def get_user_profile(
 @router.post("/{username}/friend")
 async def add_friend(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    target_user = db.query(User).filter(User.nickname == username).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    target_user = await get_user_or_404(db, username)
 
     if target_user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot add yourself as friend")
@@ -110,7 +135,7 @@ async def add_friend(
 @router.delete("/{username}/friend")
 async def remove_friend(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     return {"success": True, "message": "Friend removed successfully"}
@@ -119,12 +144,10 @@ async def remove_friend(
 @router.post("/{username}/mute")
 async def mute_user(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    target_user = db.query(User).filter(User.nickname == username).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    target_user = await get_user_or_404(db, username)
 
     # In a real implementation, you'd store muted users
     return {"success": True, "message": "User muted successfully"}
@@ -133,12 +156,10 @@ async def mute_user(
 @router.post("/{username}/block")
 async def block_user(
     username: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    target_user = db.query(User).filter(User.nickname == username).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    target_user = await get_user_or_404(db, username)
 
     # In a real implementation, you'd store blocked users
     return {"success": True, "message": "User blocked successfully"}
@@ -1,17 +1,30 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from jose import jwt
 from jose.exceptions import JWTError
+from copy import deepcopy
 from datetime import datetime, timedelta
 from typing import Optional
+import time
 
 from api.database import get_db
 from api.models.user import User
 from api.config import settings
+from api.services.metrics import metrics
+from api.utils.cache import TTLCache
 
 security = HTTPBearer()
 
+# Token -> user ID, so repeat requests skip the JWT signature check
+tokens = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+# User ID -> column values of the user, so they skip the users lookup.
+# Invalidated through websocket_manager.refresh_user on every worker.
+principals = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+metrics.cache("tokens", tokens)
+metrics.cache("principals", principals)
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -28,6 +41,9 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 
 def verify_token(token: str):
+    user_id = tokens.get(token)
+    if user_id is not None:
+        return user_id
     try:
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
@@ -38,6 +54,9 @@ def verify_token(token: str):
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
             )
+        # Never trusted past the token's own expiry
+        expires = payload.get("exp")
+        tokens.set(token, user_id, expires - time.time() if expires else None)
         return user_id
     except JWTError:
         raise HTTPException(
@@ -46,12 +65,44 @@ def verify_token(token: str):
         )
 
 
+async def load_principal(db: AsyncSession, user_id: int) -> Optional[User]:
+    """The user, from the principal cache when possible, attached to ``db``.
+
+    A hit builds a fresh instance from the cached values and merges it into
+    the session without a query, so handlers can still modify and commit it.
+    """
+    values = principals.get(user_id)
+    if values is None:
+        user = await db.get(User, user_id)
+        if user is not None:
+            remember_principal(user)
+        return user
+
+    user = User(**deepcopy(values))
+    make_transient_to_detached(user)
+    return await db.merge(user, load=False)
+
+
+def remember_principal(user: User):
+    """Cache a user just loaded from the database"""
+    principals.set(user.id, deepcopy(_column_values(user)))
+
+
+def invalidate_principal(user_id: int):
+    """Forget a cached user after it was banned, edited or deleted"""
+    principals.pop(user_id)
+
+
+def _column_values(user: User) -> dict:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     user_id = verify_token(credentials.credentials)
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await load_principal(db, int(user_id))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
@@ -63,11 +114,11 @@ async def get_current_user(
     return user
 
 
-def get_user_from_token(token: str, db: Session):
+async def get_user_from_token(token: str, db: AsyncSession):
     """Get user from token without raising exceptions (for WebSocket)"""
     try:
         user_id = verify_token(token)
-        user = db.query(User).filter(User.id == int(user_id)).first()
+        user = await load_principal(db, int(user_id))
         if user and not user.is_banned:
             return user
     except:
@@ -0,0 +1,152 @@
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import uuid
+
+from api.config import settings
+from api.services.metrics import metrics
+from api.utils.serialization import dumps, loads
+
+try:
+    from redis.exceptions import ConnectionError as RedisConnectionError
+except ImportError:  # pragma: no cover - redis is optional
+    RedisConnectionError = ConnectionError
+
+logger = logging.getLogger(__name__)
+
+# Seconds between attempts to resubscribe after losing Redis, doubling
+RECONNECT_MIN_DELAY = 0.1
+RECONNECT_MAX_DELAY = 5.0
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+class Backplane:
+    """Carries WebSocket events to every worker, including this one"""
+
+    def __init__(self, handler: EventHandler):
+        self.handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, event: dict):
+        raise NotImplementedError
+
+
+class InProcessBackplane(Backplane):
+    """Single worker: events are handed straight to the local manager"""
+
+    async def publish(self, event: dict):
+        await self.handler(event)
+
+
+class RedisBackplane(Backplane):
+    """Redis pub/sub fan-out between workers.
+
+    Events are delivered to local sockets immediately and published for the
+    other workers, which skip anything tagged with their own origin. If the
+    connection to Redis drops, the listener resubscribes with a backoff;
+    events published by other workers in the meantime are lost.
+    """
+
+    def __init__(self, handler: EventHandler, url: str, channel: str, client=None):
+        super().__init__(handler)
+        self.url = url
+        self.channel = channel
+        self.client = client
+        self._owns_client = client is None
+        self.origin = uuid.uuid4().hex
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        self.connected = False
+
+    async def start(self):
+        if self.client is None:
+            try:
+                from redis import asyncio as aioredis
+            except ImportError:
+                raise RuntimeError("The redis backplane requires the redis package")
+            self.client = aioredis.from_url(self.url)
+
+        await self._subscribe()
+        self._listener = asyncio.create_task(self._listen())
+        metrics.gauge("ws.backplane_connected", lambda: int(self.connected))
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.channel)
+            except RedisConnectionError:
+                pass
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self.connected = False
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def publish(self, event: dict):
+        await self.handler(event)
+        await self.client.publish(self.channel, dumps({**event, "origin": self.origin}))
+
+    async def _subscribe(self):
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self.connected = True
+
+    async def _listen(self):
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._subscribe()
+                    metrics.incr("ws.backplane_reconnects")
+                    logger.info("Backplane resubscribed to %s", self.channel)
+                    delay = RECONNECT_MIN_DELAY
+                async for item in self._pubsub.listen():
+                    await self._receive(item)
+                # listen() only returns once nothing is subscribed any more
+                raise RedisConnectionError("Subscription ended")
+            except (RedisConnectionError, OSError) as exc:
+                logger.warning(
+                    "Backplane connection lost (%s), retrying in %.1fs", exc, delay
+                )
+                self.connected = False
+                if self._pubsub is not None:
+                    await self._pubsub.aclose()
+                    self._pubsub = None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    async def _receive(self, item: dict):
+        if item.get("type") != "message":
+            return
+        try:
+            event = loads(item["data"])
+            if event.pop("origin", None) == self.origin:
+                return
+            await self.handler(event)
+        except Exception:
+            logger.exception("Failed to handle backplane event")
+
+
+def create_backplane(handler: EventHandler) -> Backplane:
+    """Build the backplane selected by ``WS_BACKPLANE``"""
+    if settings.WS_BACKPLANE == "redis":
+        return RedisBackplane(
+            handler, settings.REDIS_URL, settings.WS_BACKPLANE_CHANNEL
+        )
+    if settings.WS_BACKPLANE == "memory":
+        return InProcessBackplane(handler)
+    raise ValueError(f"Unknown WebSocket backplane: {settings.WS_BACKPLANE}")
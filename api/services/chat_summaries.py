@@ -0,0 +1,69 @@
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.models.chat import PrivateChatSummary, PrivateMessage
+
+
+def add_summaries(db: AsyncSession, chat_id: int, user1_id: int, user2_id: int):
+    """Give both participants of a new chat an empty inbox entry"""
+    # A set, so a chat with oneself gets a single entry
+    participants = {(user1_id, user2_id), (user2_id, user1_id)}
+    db.add_all(
+        [
+            PrivateChatSummary(chat_id=chat_id, user_id=user_id, other_user_id=other_id)
+            for user_id, other_id in participants
+        ]
+    )
+
+
+async def record_message(db: AsyncSession, message: PrivateMessage):
+    """Make a flushed message the chat's latest and count it as unread.
+
+    Runs in the caller's transaction. Both updates are relative in SQL, so
+    concurrent sends neither lose unread counts nor let an older message
+    replace a newer one as the preview.
+    """
+    summaries = PrivateChatSummary.__table__
+    await db.execute(
+        update(summaries)
+        .where(
+            summaries.c.chat_id == message.chat_id,
+            or_(
+                summaries.c.last_message_at.is_(None),
+                summaries.c.last_message_at <= message.created_at,
+            ),
+        )
+        .values(
+            last_message_id=message.id,
+            last_sender_id=message.sender_id,
+            last_content=message.content,
+            last_message_at=message.created_at,
+        )
+    )
+    await db.execute(
+        update(summaries)
+        .where(
+            summaries.c.chat_id == message.chat_id,
+            summaries.c.user_id != message.sender_id,
+        )
+        .values(unread_count=summaries.c.unread_count + 1)
+    )
+
+
+async def mark_read(db: AsyncSession, chat_id: int, user_id: int):
+    """Move the reader's watermark to the chat's latest message.
+
+    One row, however long the chat: messages carry no read flag. The latest
+    message is taken in the same statement, so one that arrives concurrently
+    is either counted as read or left unread, never half of each.
+    """
+    await db.execute(mark_read_statement(chat_id, user_id))
+
+
+def mark_read_statement(chat_id: int, user_id: int):
+    summaries = PrivateChatSummary.__table__
+    return (
+        update(summaries)
+        .where(summaries.c.chat_id == chat_id, summaries.c.user_id == user_id)
+        .values(unread_count=0, last_read_message_id=summaries.c.last_message_id)
+    )
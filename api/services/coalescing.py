@@ -0,0 +1,94 @@
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, Hashable, Optional, Set
+import asyncio
+
+from api.services.metrics import metrics
+from api.services.subscriptions import GENERAL
+
+if TYPE_CHECKING:
+    from api.services.websocket_manager import WebSocketManager
+
+
+class PresenceCoalescer:
+    """Merge typing and status transitions into one snapshot per conversation.
+
+    The first event after a quiet period arms a timer; when it fires, every
+    conversation touched during the window gets a single ``presence_snapshot``
+    frame with who is typing there and the latest status of users whose
+    status changed. Only sockets that connected with ``snapshots=1`` get
+    them; the rest keep receiving one ``typing``/``user_status`` per event.
+    """
+
+    def __init__(self, manager: "WebSocketManager", window_ms: int):
+        self.manager = manager
+        self.window = window_ms / 1000
+        # Conversation -> nicknames currently typing there
+        self.typing: Dict[Hashable, Set[str]] = defaultdict(set)
+        # Nickname -> latest status payload seen in this window
+        self.statuses: Dict[str, dict] = {}
+        self.dirty: Set[Hashable] = set()
+        self._timer: Optional[asyncio.Task] = None
+
+    def set_typing(self, key: Hashable, nickname: str, is_typing: bool):
+        typists = self.typing[key]
+        if is_typing == (nickname in typists):
+            if not typists:
+                del self.typing[key]
+            metrics.incr("ws.coalesced_events")
+            return
+        if is_typing:
+            typists.add(nickname)
+        else:
+            typists.discard(nickname)
+            if not typists:
+                del self.typing[key]
+        self._touch(key)
+
+    def set_status(self, nickname: str, status: dict):
+        if nickname in self.statuses:
+            metrics.incr("ws.coalesced_events")
+        self.statuses[nickname] = status
+        self._touch(GENERAL)
+        for key in self.manager.subscriptions.private_keys.get(nickname, ()):
+            self._touch(key)
+
+    def forget(self, nickname: str):
+        """Stop showing a user who went offline as typing anywhere"""
+        for key in [key for key, typists in self.typing.items() if nickname in typists]:
+            self.set_typing(key, nickname, False)
+
+    def _touch(self, key: Hashable):
+        self.dirty.add(key)
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        dirty, self.dirty = self.dirty, set()
+        statuses, self.statuses = self.statuses, {}
+
+        for key in dirty:
+            if key == GENERAL:
+                conversation = {"chatType": "general"}
+                changed = list(statuses.values())
+            else:
+                conversation = {"chatType": "private", "participants": list(key[1:])}
+                changed = [statuses[n] for n in key[1:] if n in statuses]
+
+            metrics.incr("ws.presence_snapshots")
+            await self.manager.deliver_snapshot(
+                key,
+                {
+                    "type": "presence_snapshot",
+                    "data": {
+                        **conversation,
+                        "typing": sorted(self.typing.get(key, ())),
+                        "statuses": changed,
+                    },
+                },
+                coalesce_key=("presence_snapshot", key),
+            )
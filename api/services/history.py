@@ -0,0 +1,110 @@
+from bisect import insort
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from api.config import settings
+from api.models.message import MessageType
+from api.services.metrics import metrics
+from api.utils.cache import LRUCache
+from api.utils.pagination import encode_cursor, fetch, keyset_query
+from api.utils.serialization import dumps
+
+
+def _sort_key(message: dict) -> Tuple[datetime, int]:
+    created_at = datetime.fromisoformat(message["timestamp"])
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return created_at, int(message["id"])
+
+
+class MessageWindow:
+    """The newest ``size`` messages of one conversation, each serialized once.
+
+    Filled from the database on first use, then kept current by the send
+    path through the backplane, so the first page of history is answered
+    without a query. ``complete`` means the window holds the conversation's
+    entire history, so a short window still knows there is nothing older.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.loaded = False
+        self.complete = False
+        # ((created_at, id), timestamp, encoded message), oldest first
+        self.entries: List[Tuple[Tuple[datetime, int], datetime, bytes]] = []
+        self._ids = set()
+
+    def add(self, message: dict):
+        """Insert a committed message, wherever it sorts"""
+        if int(message["id"]) in self._ids:
+            return
+        key = _sort_key(message)
+        timestamp = datetime.fromisoformat(message["timestamp"])
+        insort(self.entries, (key, timestamp, dumps(message)))
+        self._ids.add(key[1])
+        if len(self.entries) > self.size:
+            (_, dropped), _, _ = self.entries.pop(0)
+            self._ids.discard(dropped)
+            self.complete = False
+
+    async def load(
+        self, db: AsyncSession, query: Select, model, serialize: Callable[..., dict]
+    ):
+        """Merge in the newest ``size`` rows of ``query``, serialized"""
+        rows = await fetch(db, keyset_query(query, model, self.size))
+        self.complete = len(rows) <= self.size
+        for row in rows[: self.size]:
+            self.add(serialize(row))
+        self.loaded = True
+
+    def page(self, limit: int) -> Optional[Response]:
+        """The first page of history as a ready response, or None to use SQL"""
+        if not self.loaded or (len(self.entries) <= limit and not self.complete):
+            metrics.incr("history.window_misses")
+            return None
+        metrics.incr("history.window_hits")
+        entries = self.entries[-limit:]
+        has_more = len(self.entries) > limit
+        pagination = {
+            "hasMore": has_more,
+            "nextCursor": (
+                encode_cursor(entries[0][1], entries[0][0][1]) if has_more else None
+            ),
+        }
+        body = b"".join(
+            [
+                b'{"success":true,"data":[',
+                b",".join(entry[2] for entry in entries),
+                b'],"pagination":',
+                dumps(pagination),
+                b"}",
+            ]
+        )
+        return Response(content=body, media_type="application/json")
+
+
+# Message types GET /api/messages lists
+ROOM_HISTORY_TYPES = {MessageType.MESSAGE.value, MessageType.SYSTEM.value}
+
+# Room history, and private chats by ID for the most recently read chats
+room_history = MessageWindow(settings.HISTORY_WINDOW_SIZE)
+private_histories = LRUCache(settings.HISTORY_PRIVATE_CHATS)
+metrics.cache("private_histories", private_histories)
+
+
+def record_room_message(message: dict):
+    """Add a committed room message to the window, unless history hides it"""
+    if message["type"] in ROOM_HISTORY_TYPES:
+        room_history.add(message)
+
+
+def private_history(chat_id: int) -> MessageWindow:
+    window = private_histories.get(chat_id)
+    if window is None:
+        window = MessageWindow(settings.HISTORY_PRIVATE_WINDOW_SIZE)
+        private_histories.set(chat_id, window)
+    return window
@@ -0,0 +1,131 @@
+from operator import attrgetter
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api.config import settings
+from api.database import AsyncSessionLocal
+from api.models.message import Message
+from api.services.metrics import metrics
+from api.utils.helpers import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class MessageIngest:
+    """Group commit for room messages.
+
+    The first message after a quiet period arms a ``window_ms`` timer; every
+    message submitted before it fires is inserted by one multi-row INSERT in
+    one transaction, so a burst costs one commit instead of one per line.
+    Each caller gets its own row back, with ID and timestamp, only once that
+    commit succeeded. Batches are written one at a time: the next batch fills
+    up while the previous one commits.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker = AsyncSessionLocal,
+        window_ms: int = 2,
+        max_batch: int = 256,
+    ):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def submit(self, values: dict) -> Message:
+        """Insert a message from its column values; returns the committed row"""
+        if self.window <= 0:
+            return (await self._commit([values]))[0]
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((values, future))
+        if len(self.pending) >= self.max_batch:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = asyncio.create_task(self._flush_later(0))
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later(self.window))
+        return await future
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(delay)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            batch = self.pending[: self.max_batch]
+            del self.pending[: self.max_batch]
+            if self.pending and self._timer is None:
+                self._timer = asyncio.create_task(self._flush_later(0))
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]):
+        # Only the commit is retried: once it succeeded the rows exist, and
+        # writing them again one by one would duplicate them
+        try:
+            messages = await self._commit([values for values, _ in batch])
+        except Exception as exc:
+            if len(batch) > 1:
+                # One bad row fails the whole INSERT; retry alone so only it does
+                logger.warning(
+                    "Group commit of %d messages failed: %s", len(batch), exc
+                )
+                for item in batch:
+                    await self._write([item])
+                return
+            future = batch[0][1]
+            if not future.done():
+                future.set_exception(exc)
+            return
+
+        for message, (_, future) in zip(messages, batch):
+            if not future.done():
+                future.set_result(message)
+
+    async def _commit(self, rows: List[dict]) -> List[Message]:
+        """One INSERT for all rows; returns their messages in the same order"""
+        for values in rows:
+            values.setdefault("created_at", utcnow())
+        async with self.session_factory() as db:
+            if db.bind.dialect.insert_executemany_returning:
+                # RETURNING comes back in no set order, and asking for parameter
+                # order makes SQLite fall back to one INSERT per row. One INSERT
+                # draws its IDs in VALUES order, so ascending IDs line up with
+                # the rows as given.
+                inserted = sorted(
+                    (await db.scalars(insert(Message).returning(Message), rows)).all(),
+                    key=attrgetter("id"),
+                )
+            else:
+                # No multi-row RETURNING (MySQL): the ORM inserts row by row
+                # and assigns each object its primary key
+                inserted = [Message(**values) for values in rows]
+                db.add_all(inserted)
+            await db.commit()
+        metrics.incr("db.group_commits")
+        metrics.incr("db.group_committed_messages", len(rows))
+        return inserted
+
+    async def stop(self):
+        """Write whatever is still waiting, e.g. at shutdown"""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        while self.pending:
+            await self.flush()
+
+
+# Global instance
+message_ingest = MessageIngest(
+    window_ms=settings.DB_GROUP_COMMIT_WINDOW_MS,
+    max_batch=settings.DB_GROUP_COMMIT_MAX_BATCH,
+)
@@ -0,0 +1,33 @@
+from collections import defaultdict
+from typing import Callable, Dict
+
+
+class Metrics:
+    """In-process counters and gauges, exposed on ``GET /metrics``"""
+
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def incr(self, name: str, value: int = 1):
+        self.counters[name] += value
+
+    def gauge(self, name: str, func: Callable[[], float]):
+        """Register a callable sampled on every snapshot"""
+        self.gauges[name] = func
+
+    def cache(self, name: str, cache):
+        """Report a cache's size, hits and misses as ``cache.<name>.*``"""
+        self.gauge(f"cache.{name}.size", cache.__len__)
+        self.gauge(f"cache.{name}.hits", lambda: cache.hits)
+        self.gauge(f"cache.{name}.misses", lambda: cache.misses)
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": {name: func() for name, func in sorted(self.gauges.items())},
+        }
+
+
+# Global instance
+metrics = Metrics()
@@ -0,0 +1,319 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from api.services.backplane import Backplane, RedisBackplane
+from api.utils.serialization import dumps, loads
+
+try:
+    from redis.exceptions import WatchError
+except ImportError:  # pragma: no cover - redis is optional
+    WatchError = None
+
+logger = logging.getLogger(__name__)
+
+# Publishes a diff to every worker: (diff, user ID not to send it to)
+DiffPublisher = Callable[[dict, Optional[int]], Awaitable[None]]
+
+
+def presence_diff(event_type: str, data: dict, version: int) -> dict:
+    return {"type": event_type, "data": {**data, "version": version}}
+
+
+class PresenceRegistry:
+    """Online users, maintained incrementally from connect/disconnect/update.
+
+    Every change bumps ``version`` and returns a diff frame, so clients can
+    take one snapshot and then apply diffs in order; a gap in versions means
+    a diff was missed and the snapshot should be fetched again.
+
+    With a single worker the registry is the source of truth. With several,
+    ``RedisPresence`` makes the changes and each worker's registry follows
+    them through ``apply``.
+    """
+
+    def __init__(self):
+        self.version = 0
+        # User ID -> public user dict, in join order
+        self.users: Dict[int, dict] = {}
+        # User ID -> open sockets
+        self.connections: Dict[int, int] = {}
+        # User ID -> version of the last diff about them; diffs arrive from
+        # several workers, so an older one may come after a newer one
+        self.versions: Dict[int, int] = {}
+        # Everything up to this version is already in ``users`` (see load)
+        self.floor = 0
+        self._snapshot: Optional[bytes] = None
+
+    async def join(self, user: dict) -> Optional[dict]:
+        user_id = int(user["id"])
+        self.connections[user_id] = self.connections.get(user_id, 0) + 1
+        if user_id in self.users:
+            return None
+        self.users[user_id] = user
+        return self._diff("user_joined", user)
+
+    async def leave(self, user_id: int) -> Optional[dict]:
+        remaining = self.connections.get(user_id, 0) - 1
+        if remaining > 0:
+            self.connections[user_id] = remaining
+            return None
+        self.connections.pop(user_id, None)
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return None
+        return self._diff("user_left", {"id": user["id"], "nickname": user["nickname"]})
+
+    async def update(self, user: dict) -> Optional[dict]:
+        user_id = int(user["id"])
+        if user_id not in self.users or self.users[user_id] == user:
+            return None
+        self.users[user_id] = user
+        return self._diff("user_updated", user)
+
+    def load(self, version: int, users: List[dict]):
+        """Start from a shared snapshot; diffs up to ``version`` are in it"""
+        self.users = {int(user["id"]): user for user in users}
+        self.version = self.floor = version
+        self.versions = {k: v for k, v in self.versions.items() if v > version}
+        self._snapshot = None
+
+    def apply(self, diff: dict):
+        """Follow a diff made elsewhere; stale and already applied ones are no-ops"""
+        data = dict(diff["data"])
+        version = data.pop("version")
+        user_id = int(data["id"])
+        if version <= self.versions.get(user_id, self.floor):
+            return
+        self.versions[user_id] = version
+        self.version = max(self.version, version)
+        if diff["type"] == "user_left":
+            self.users.pop(user_id, None)
+        elif diff["type"] == "user_joined" or user_id in self.users:
+            self.users[user_id] = data
+        self._snapshot = None
+
+    def list(self) -> List[dict]:
+        return list(self.users.values())
+
+    def snapshot(self) -> bytes:
+        """Serialized API response body, rebuilt only after a change"""
+        if self._snapshot is None:
+            self._snapshot = dumps(
+                {
+                    "success": True,
+                    "data": {"version": self.version, "users": self.list()},
+                }
+            )
+        return self._snapshot
+
+    def _diff(self, event_type: str, data: dict) -> dict:
+        self.version += 1
+        self.versions[int(data["id"])] = self.version
+        self._snapshot = None
+        return presence_diff(event_type, data, self.version)
+
+
+class RedisPresence:
+    """Presence shared by every worker through Redis.
+
+    Socket counts, the online users and the version counter change together
+    in one optimistic transaction, so exactly one worker sees a user's first
+    join and last leave, and versions are global. Each worker also records
+    how many sockets it holds per user under a lease it renews every
+    ``ttl / 3`` seconds. When a lease expires, the first worker to notice
+    releases that worker's users, so a crashed worker's users go offline.
+    """
+
+    def __init__(
+        self, client, prefix: str, origin: str, ttl: int, publish: DiffPublisher
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.origin = origin
+        self.ttl = ttl
+        self.publish = publish
+        self.version_key = f"{prefix}:version"
+        self.users_key = f"{prefix}:users"
+        self.sockets_key = f"{prefix}:sockets"
+        self.workers_key = f"{prefix}:workers"
+        # This worker's users: ID -> [public user dict, sockets held here]
+        self.local: Dict[int, list] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def worker_key(self, origin: str) -> str:
+        return f"{self.prefix}:worker:{origin}"
+
+    def alive_key(self, origin: str) -> str:
+        return f"{self.prefix}:alive:{origin}"
+
+    async def start(self):
+        await self.client.set(self.alive_key(self.origin), 1, ex=self.ttl)
+        await self.client.sadd(self.workers_key, self.origin)
+        self._heartbeat = asyncio.create_task(self._run_heartbeat())
+
+    async def stop(self):
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        # Hand our users back now rather than when the lease runs out
+        await self.client.delete(self.alive_key(self.origin))
+        await self.release(self.origin)
+        self.local.clear()
+
+    async def snapshot(self) -> Tuple[int, List[dict]]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.get(self.version_key)
+            pipe.hgetall(self.users_key)
+            version, users = await pipe.execute()
+        return int(version or 0), [loads(user) for user in users.values()]
+
+    async def join(self, user: dict) -> Optional[dict]:
+        user_id = int(user["id"])
+        entry = self.local.setdefault(user_id, [user, 0])
+        entry[0] = user
+        entry[1] += 1
+        return await self._add(user, 1, entry[1])
+
+    async def leave(self, user_id: int) -> Optional[dict]:
+        entry = self.local.get(user_id)
+        if entry is None:
+            return None
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self.local[user_id]
+        return await self._remove(user_id, 1, self.origin, max(entry[1], 0))
+
+    async def update(self, user: dict) -> Optional[dict]:
+        user_id = int(user["id"])
+        if user_id in self.local:
+            self.local[user_id][0] = user
+
+        async def step(pipe):
+            current = await pipe.hget(self.users_key, user_id)
+            if current is None or loads(current) == user:
+                return None
+            pipe.multi()
+            pipe.hset(self.users_key, user_id, dumps(user))
+            pipe.incr(self.version_key)
+            version = (await pipe.execute())[-1]
+            return presence_diff("user_updated", user, version)
+
+        return await self._transact(step, self.users_key)
+
+    async def heartbeat(self):
+        """Renew this worker's lease and release the users of expired ones"""
+        await self.client.set(self.alive_key(self.origin), 1, ex=self.ttl)
+        if await self.client.sadd(self.workers_key, self.origin):
+            # Taken for dead (a stall longer than the lease): rejoin our users
+            logger.warning("Presence lease of worker %s had expired", self.origin)
+            for user, sockets in list(self.local.values()):
+                diff = await self._add(user, sockets, sockets)
+                if diff:
+                    await self.publish(diff, None)
+
+        for origin in await self.client.smembers(self.workers_key):
+            origin = origin.decode() if isinstance(origin, bytes) else origin
+            if origin != self.origin and not await self.client.exists(
+                self.alive_key(origin)
+            ):
+                await self.release(origin)
+
+    async def release(self, origin: str):
+        """Take every socket of a gone worker offline, once across workers"""
+        if not await self.client.srem(self.workers_key, origin):
+            return
+        key = self.worker_key(origin)
+        for user_id, sockets in (await self.client.hgetall(key)).items():
+            diff = await self._remove(int(user_id), int(sockets), origin, 0)
+            if diff:
+                await self.publish(diff, None)
+        await self.client.delete(key)
+
+    async def _run_heartbeat(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self.heartbeat()
+            except Exception:
+                logger.exception("Presence heartbeat failed")
+
+    async def _add(self, user: dict, sockets: int, here: int) -> Optional[dict]:
+        user_id = int(user["id"])
+
+        async def step(pipe):
+            total = int(await pipe.hget(self.sockets_key, user_id) or 0)
+            pipe.multi()
+            pipe.hset(self.worker_key(self.origin), user_id, here)
+            pipe.hincrby(self.sockets_key, user_id, sockets)
+            if total > 0:
+                await pipe.execute()
+                return None
+            pipe.hset(self.users_key, user_id, dumps(user))
+            pipe.incr(self.version_key)
+            version = (await pipe.execute())[-1]
+            return presence_diff("user_joined", user, version)
+
+        return await self._transact(step, self.sockets_key)
+
+    async def _remove(
+        self, user_id: int, sockets: int, origin: str, here: int
+    ) -> Optional[dict]:
+        """Drop ``sockets`` of ``origin``'s sockets, unless already released"""
+        worker_key = self.worker_key(origin)
+
+        async def step(pipe):
+            if await pipe.hget(worker_key, user_id) is None:
+                # Released while we were taken for dead: not ours to count
+                return None
+            total = int(await pipe.hget(self.sockets_key, user_id) or 0)
+            user = await pipe.hget(self.users_key, user_id)
+            remaining = max(total - sockets, 0)
+            pipe.multi()
+            if here > 0:
+                pipe.hset(worker_key, user_id, here)
+            else:
+                pipe.hdel(worker_key, user_id)
+            if remaining > 0:
+                pipe.hset(self.sockets_key, user_id, remaining)
+                await pipe.execute()
+                return None
+            pipe.hdel(self.sockets_key, user_id)
+            pipe.hdel(self.users_key, user_id)
+            pipe.incr(self.version_key)
+            version = (await pipe.execute())[-1]
+            if user is None:
+                return None
+            user = loads(user)
+            return presence_diff(
+                "user_left", {"id": user["id"], "nickname": user["nickname"]}, version
+            )
+
+        return await self._transact(step, self.sockets_key, worker_key)
+
+    async def _transact(self, step, *keys: str):
+        """Run ``step`` under WATCH on ``keys``, again if one changed meanwhile"""
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(*keys)
+                    return await step(pipe)
+                except WatchError:
+                    continue
+
+
+def create_presence_store(
+    backplane: Backplane, registry: PresenceRegistry, publish: DiffPublisher, ttl: int
+):
+    """Where presence changes are decided: the registry itself in one process,
+    Redis when workers share a Redis backplane. Call after the backplane has
+    started, so its Redis client exists."""
+    if isinstance(backplane, RedisBackplane):
+        return RedisPresence(
+            backplane.client,
+            f"{backplane.channel}:presence",
+            backplane.origin,
+            ttl,
+            publish,
+        )
+    return registry
@@ -0,0 +1,74 @@
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import settings
+from api.models.chat import PrivateChat
+from api.services.chat_summaries import add_summaries
+from api.services.metrics import metrics
+from api.utils.cache import LRUCache
+
+# (lower user ID, higher user ID) -> chat ID. Chats are never deleted or
+# re-keyed while the API runs, so entries don't need invalidating.
+chat_ids = LRUCache(settings.PRIVATE_CHAT_CACHE_SIZE)
+metrics.cache("private_chats", chat_ids)
+
+
+def chat_pair(user_id: int, other_id: int) -> Tuple[int, int]:
+    """The canonical ``(user1_id, user2_id)`` of the chat between two users"""
+    return (user_id, other_id) if user_id <= other_id else (other_id, user_id)
+
+
+def chat_id_query(pair: Tuple[int, int]):
+    return select(PrivateChat.id).where(
+        PrivateChat.user1_id == pair[0], PrivateChat.user2_id == pair[1]
+    )
+
+
+async def _select_chat_id(db: AsyncSession, pair: Tuple[int, int]) -> Optional[int]:
+    return await db.scalar(chat_id_query(pair))
+
+
+async def find_chat_id(db: AsyncSession, user_id: int, other_id: int) -> Optional[int]:
+    """The ID of the chat between two users, or None if they never talked"""
+    pair = chat_pair(user_id, other_id)
+    chat_id = chat_ids.get(pair)
+    if chat_id is None:
+        chat_id = await _select_chat_id(db, pair)
+        if chat_id is not None:
+            chat_ids.set(pair, chat_id)
+    return chat_id
+
+
+def _insert_ignore(dialect: str, user1_id: int, user2_id: int):
+    """INSERT of a chat that does nothing if the pair already exists"""
+    values = {"user1_id": user1_id, "user2_id": user2_id}
+    if dialect == "mysql":
+        return mysql.insert(PrivateChat).values(values).prefix_with("IGNORE")
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    return (
+        insert(PrivateChat)
+        .values(values)
+        .on_conflict_do_nothing(index_elements=["user1_id", "user2_id"])
+    )
+
+
+async def get_or_create_chat_id(db: AsyncSession, user_id: int, other_id: int) -> int:
+    """The chat between two users, created in the caller's transaction if new.
+
+    Concurrent first messages race on the unique pair index: one insert
+    wins, the others do nothing and read the winner's chat.
+    """
+    chat_id = await find_chat_id(db, user_id, other_id)
+    if chat_id is not None:
+        return chat_id
+
+    pair = chat_pair(user_id, other_id)
+    result = await db.execute(_insert_ignore(db.bind.dialect.name, *pair))
+    chat_id = await _select_chat_id(db, pair)
+    if result.rowcount:
+        add_summaries(db, chat_id, *pair)
+    # Not cached until committed: a rollback would leave a dangling ID
+    return chat_id
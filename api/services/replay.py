@@ -0,0 +1,48 @@
+from collections import deque
+from itertools import islice
+from typing import List, Optional
+import uuid
+
+from api.utils.serialization import Frame
+
+
+class ReplayBuffer:
+    """The most recent broadcast events, numbered for gap-free reconnects.
+
+    Every event gets the next ``seq``. A client that reconnects with the last
+    ``seq`` it saw can be replayed whatever it missed, as long as that is
+    still in the ring. ``epoch`` changes whenever the numbering restarts (a
+    new process), so a ``seq`` from another epoch is never trusted.
+    """
+
+    def __init__(self, size: int):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # (seq, frame, excluded user ID) for the last ``size`` events
+        self.events: deque = deque(maxlen=size)
+
+    def append(self, message: dict, exclude_user: int = None) -> Frame:
+        self.seq += 1
+        frame = Frame({**message, "seq": self.seq})
+        self.events.append((self.seq, frame, exclude_user))
+        return frame
+
+    def since(self, last_seq: int, epoch: str, user_id: int) -> Optional[List[Frame]]:
+        """Frames after ``last_seq`` for one user, or None if some are gone"""
+        if epoch != self.epoch or last_seq > self.seq:
+            return None
+        if last_seq == self.seq:
+            return []
+        oldest = self.events[0][0] if self.events else self.seq + 1
+        if oldest > last_seq + 1:
+            return None
+        return [
+            frame
+            for _, frame, exclude_user in islice(
+                self.events, last_seq + 1 - oldest, None
+            )
+            if exclude_user != user_id
+        ]
+
+    def session(self) -> dict:
+        return {"epoch": self.epoch, "seq": self.seq}
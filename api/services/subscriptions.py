@@ -0,0 +1,99 @@
+from collections import defaultdict
+from typing import Dict, Hashable, Optional, Set
+
+from fastapi import WebSocket
+
+# Conversation key of the public room
+GENERAL = "general"
+
+
+def conversation_key(chat_type: str, nickname: str, target_user: Optional[str]):
+    """Key a conversation: the general room or an unordered private pair"""
+    if chat_type == "private" and target_user:
+        first, second = sorted((nickname, target_user))
+        return ("private", first, second)
+    return GENERAL
+
+
+class SubscriptionIndex:
+    """Which sockets are viewing which conversation.
+
+    Sockets start out subscribed to the general room. Until a client sends
+    its first subscribe/unsubscribe frame it is "unscoped" and also receives
+    events for every private conversation its user takes part in, which keeps
+    clients that never declare a view working as before.
+    """
+
+    def __init__(self):
+        self.subscribers: Dict[Hashable, Set[WebSocket]] = defaultdict(set)
+        self.views: Dict[WebSocket, Set[Hashable]] = {}
+        # Nickname -> sockets that never declared a view
+        self.unscoped: Dict[str, Set[WebSocket]] = defaultdict(set)
+        # Nickname -> private conversations that have explicit subscribers
+        self.private_keys: Dict[str, Set[tuple]] = defaultdict(set)
+
+    def add(self, websocket: WebSocket, nickname: str):
+        self.views[websocket] = set()
+        self.unscoped[nickname].add(websocket)
+        self._subscribe(websocket, GENERAL)
+
+    def remove(self, websocket: WebSocket, nickname: str):
+        for key in self.views.pop(websocket, ()):
+            self._discard(websocket, key)
+        self._discard_unscoped(websocket, nickname)
+
+    def subscribe(self, websocket: WebSocket, nickname: str, key: Hashable):
+        if websocket not in self.views:
+            return
+        self._discard_unscoped(websocket, nickname)
+        self._subscribe(websocket, key)
+
+    def unsubscribe(self, websocket: WebSocket, nickname: str, key: Hashable):
+        if websocket not in self.views:
+            return
+        self._discard_unscoped(websocket, nickname)
+        if key in self.views[websocket]:
+            self.views[websocket].discard(key)
+            self._discard(websocket, key)
+
+    def audience(self, key: Hashable) -> Set[WebSocket]:
+        """Sockets that should see events of one conversation"""
+        sockets = set(self.subscribers.get(key, ()))
+        if key != GENERAL:
+            for nickname in key[1:]:
+                sockets |= self.unscoped.get(nickname, set())
+        return sockets
+
+    def presence_audience(self, nickname: str) -> Set[WebSocket]:
+        """Sockets viewing the general room or a private chat with this user"""
+        sockets = set(self.subscribers.get(GENERAL, ()))
+        for key in self.private_keys.get(nickname, ()):
+            sockets |= self.subscribers[key]
+        return sockets
+
+    def _subscribe(self, websocket: WebSocket, key: Hashable):
+        self.views[websocket].add(key)
+        self.subscribers[key].add(websocket)
+        if key != GENERAL:
+            for nickname in key[1:]:
+                self.private_keys[nickname].add(key)
+
+    def _discard(self, websocket: WebSocket, key: Hashable):
+        sockets = self.subscribers.get(key)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del self.subscribers[key]
+            if key != GENERAL:
+                for nickname in key[1:]:
+                    self.private_keys[nickname].discard(key)
+                    if not self.private_keys[nickname]:
+                        del self.private_keys[nickname]
+
+    def _discard_unscoped(self, websocket: WebSocket, nickname: str):
+        sockets = self.unscoped.get(nickname)
+        if sockets is not None:
+            sockets.discard(websocket)
+            if not sockets:
+                del self.unscoped[nickname]
@@ -0,0 +1,65 @@
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.config import settings
+from api.models.user import User
+from api.services.auth_service import (
+    invalidate_principal,
+    load_principal,
+    remember_principal,
+)
+from api.services.metrics import metrics
+from api.utils.cache import LRUCache, TTLCache
+
+# Nickname -> user ID. The user itself comes from the principal cache, and
+# is checked against the nickname in case it was renamed since.
+user_ids = LRUCache(settings.NICKNAME_CACHE_SIZE)
+# Nicknames nobody has, so repeated lookups of a typo don't reach the
+# database. Kept briefly: another worker may register the name meanwhile.
+unknown = TTLCache(settings.NICKNAME_CACHE_SIZE, settings.NICKNAME_NEGATIVE_TTL)
+metrics.cache("nicknames", user_ids)
+metrics.cache("unknown_nicknames", unknown)
+
+
+async def resolve_user(db: AsyncSession, nickname: str) -> Optional[User]:
+    """The user with this nickname attached to ``db``, or None"""
+    user_id = user_ids.get(nickname)
+    if user_id is not None:
+        user = await load_principal(db, user_id)
+        if user is not None and user.nickname == nickname:
+            return user
+        user_ids.pop(nickname)
+    elif unknown.get(nickname):
+        return None
+
+    user = await db.scalar(select(User).where(User.nickname == nickname))
+    if user is None:
+        unknown.set(nickname, True)
+        return None
+    user_ids.set(nickname, user.id)
+    remember_principal(user)
+    return user
+
+
+async def get_user_or_404(
+    db: AsyncSession, nickname: str, detail: str = "User not found"
+) -> User:
+    user = await resolve_user(db, nickname)
+    if user is None:
+        raise HTTPException(status_code=404, detail=detail)
+    return user
+
+
+def forget_nickname(nickname: str):
+    """Drop what is cached for a nickname, e.g. once a user takes it"""
+    user_ids.pop(nickname)
+    unknown.pop(nickname)
+
+
+def invalidate_user(user_id: int, nickname: str):
+    """Forget a user that was renamed, banned or otherwise changed"""
+    forget_nickname(nickname)
+    invalidate_principal(user_id)
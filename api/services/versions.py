@@ -0,0 +1,50 @@
+from collections import defaultdict
+from typing import Dict, Optional
+import uuid
+
+from fastapi import Request, Response
+
+
+class VersionCounters:
+    """Change counters behind the ETags of polled GET endpoints.
+
+    Writers announce what they changed through the backplane, so every
+    worker bumps the same keys. Counters restart with the process, so tags
+    carry this worker's epoch: a tag from another worker or an earlier run
+    never matches and is simply answered in full.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def bump(self, *keys: str):
+        for key in keys:
+            self.counters[key] += 1
+
+    def etag(self, *keys: str) -> str:
+        versions = ".".join(str(self.counters.get(key, 0)) for key in keys)
+        return f'W/"{self.epoch}-{versions}"'
+
+
+def not_modified(
+    request: Request, response: Response, *keys: str
+) -> Optional[Response]:
+    """A 304 if the client holds the current version of ``keys``.
+
+    Otherwise tags ``response`` (the handler's injected response) and
+    returns None, so the handler goes on to build the body.
+    """
+    etag = versions.etag(*keys)
+    response.headers["ETag"] = etag
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+# Global instance
+versions = VersionCounters()
@@ -1,127 +1,817 @@
-from fastapi import WebSocket
-from typing import Dict, List, Set
-import json
-from sqlalchemy.orm import Session
+from fastapi import WebSocket, WebSocketDisconnect
+from typing import Dict, Iterable, List, Optional, Set, Hashable
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+import asyncio
+import logging
 
-from api.database import SessionLocal
+from api.config import settings
+from api.database import AsyncSessionLocal
 from api.services.auth_service import get_user_from_token
-from api.models.user import User
+from api.services.user_resolver import invalidate_user
+from api.services.backplane import create_backplane
+from api.services.coalescing import PresenceCoalescer
+from api.services.history import private_histories, record_room_message
+from api.services.metrics import metrics
+from api.services.presence import PresenceRegistry, RedisPresence, create_presence_store
+from api.services.replay import ReplayBuffer
+from api.services.versions import versions
+from api.services.subscriptions import SubscriptionIndex, conversation_key
+from api.models.user import User, UserStatus
+from api.utils.serialization import (
+    Frame,
+    batch_msgpack,
+    batch_text,
+    loads,
+    msgpack,
+)
+from api.utils.timing_wheel import TimingWheel
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_POLICIES = ("drop", "coalesce", "disconnect")
+
+# Close code sent to consumers that fell too far behind ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Close code sent to sockets of a user who was just banned ("Policy Violation")
+BANNED_CLOSE_CODE = 1008
+# Close code sent to sockets that stopped answering pings ("Going Away")
+IDLE_CLOSE_CODE = 1001
+
+# Heartbeat timers kept in the timing wheel
+PING = "ping"
+IDLE = "idle"
+
+USER_STATUSES = {status.value for status in UserStatus}
+
+# Seconds between heartbeat ticks; the resolution of ping and idle timers
+HEARTBEAT_TICK = 1.0
+PING_FRAME = Frame({"type": "ping"})
+
+# Subprotocol a client offers to exchange MessagePack binary frames
+MSGPACK_SUBPROTOCOL = "chatconnect.msgpack"
+
+
+def _hashable(value):
+    """Restore tuple keys that went through JSON on the backplane"""
+    if isinstance(value, list):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+@dataclass(slots=True)
+class ConnectedUser:
+    """The few user fields the manager needs, detached from the ORM session"""
+
+    id: int
+    nickname: str
+    avatar: Optional[str] = None
+    age_group: Optional[str] = None
+    roles: Optional[List[str]] = None
+    status: str = "online"
+
+    @classmethod
+    def from_user(cls, user: User) -> "ConnectedUser":
+        return cls(
+            id=user.id,
+            nickname=user.nickname,
+            avatar=user.avatar,
+            age_group=user.age_group,
+            roles=list(user.roles or ["Member"]),
+            status=user.status.value if user.status else "online",
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": str(self.id),
+            "nickname": self.nickname,
+            "avatar": self.avatar,
+            "ageGroup": self.age_group,
+            "roles": self.roles or ["Member"],
+            "status": self.status,
+        }
+
+
+class Connection:
+    """A socket with its own bounded outbound queue, drained by a writer task"""
+
+    __slots__ = (
+        "websocket",
+        "user",
+        "queue",
+        "keys",
+        "wakeup",
+        "writer",
+        "closing",
+        "last_seen",
+        "codec",
+        "batch",
+        "snapshots",
+        "heartbeat",
+        "timers",
+    )
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user: ConnectedUser,
+        codec: str = "json",
+        batch: bool = False,
+        snapshots: bool = False,
+        heartbeat: bool = False,
+    ):
+        self.websocket = websocket
+        self.user = user
+        # Wire format negotiated at handshake: "json" text or "msgpack" binary
+        self.codec = codec
+        # Client asked for events grouped into array frames
+        self.batch = batch
+        # Client asked for presence snapshots instead of typing/status events
+        self.snapshots = snapshots
+        # Client answers app-level pings and may be reaped when silent
+        self.heartbeat = heartbeat
+        # PING/IDLE -> the socket's handle in the heartbeat timing wheel
+        self.timers: Dict[str, list] = {}
+        # Pending frames as [coalesce_key, frame] pairs
+        self.queue: deque = deque()
+        # Coalesce key -> queued pair, so superseded frames can be replaced
+        self.keys: Dict[Hashable, list] = {}
+        self.wakeup = asyncio.Event()
+        self.writer: Optional[asyncio.Task] = None
+        self.closing = False
+        # Loop time of the last frame received from the client
+        self.last_seen = asyncio.get_running_loop().time()
+
+    def enqueue(self, frame: Frame, high_water: int, policy: str, key=None) -> str:
+        """Queue a frame without awaiting; returns what happened to it"""
+        if len(self.queue) < high_water:
+            entry = [key, frame]
+            self.queue.append(entry)
+            if key is not None:
+                self.keys[key] = entry
+            self.wakeup.set()
+            return "queued"
+
+        if policy == "coalesce" and key is not None and key in self.keys:
+            self.keys[key][1] = frame
+            return "coalesced"
+
+        if policy == "disconnect":
+            return "overflow"
+
+        return "dropped"
+
+    async def next_frame(self) -> Frame:
+        while not self.queue:
+            self.wakeup.clear()
+            await self.wakeup.wait()
+        entry = self.queue.popleft()
+        key, frame = entry
+        if key is not None and self.keys.get(key) is entry:
+            del self.keys[key]
+        return frame
+
+    def drain(self) -> List[Frame]:
+        """Take every frame queued right now"""
+        frames = [frame for _, frame in self.queue]
+        self.queue.clear()
+        self.keys.clear()
+        return frames
 
 
 class WebSocketManager:
     def __init__(self):
         # Store active connections with user info
-        self.active_connections: Dict[WebSocket, User] = {}
+        self.active_connections: Dict[WebSocket, Connection] = {}
+        # One shared record per connected user, whatever their socket count
+        self.users: Dict[int, ConnectedUser] = {}
+        # Online users across all workers, with a cached versioned snapshot
+        self.presence = PresenceRegistry()
+        # Decides joins and leaves: the registry itself, or Redis (see start)
+        self.presence_store = self.presence
         # Store connections by user ID for easy lookup
         self.user_connections: Dict[int, Set[WebSocket]] = {}
+        # Conversation -> sockets viewing it, for typing and status events
+        self.subscriptions = SubscriptionIndex()
+        # Typing/status snapshots for clients that ask for them; a zero window
+        # sends every client the per-event frames
+        self.coalescer = (
+            PresenceCoalescer(self, settings.WS_TYPING_WINDOW_MS)
+            if settings.WS_TYPING_WINDOW_MS > 0
+            else None
+        )
+        # Numbered recent broadcasts, replayed to clients that reconnect
+        self.replay = (
+            ReplayBuffer(settings.WS_REPLAY_BUFFER_SIZE)
+            if settings.WS_REPLAY_BUFFER_SIZE > 0
+            else None
+        )
+        # Fan-out between workers; in-process unless configured otherwise
+        self.backplane = create_backplane(self._on_event)
+        # Keep references to fire-and-forget close tasks
+        self._closing_tasks: Set[asyncio.Task] = set()
+
+        self.high_water = settings.WS_SEND_QUEUE_SIZE
+        self.policy = settings.WS_SLOW_CONSUMER_POLICY
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.policy}")
+        # How long a batching connection collects frames before a write
+        self.batch_window = settings.WS_BATCH_WINDOW_MS / 1000
+
+        # Ping and idle deadlines, expired a tick at a time by the heartbeat
+        self.ping_interval = settings.WS_PING_INTERVAL
+        self.idle_timeout = settings.WS_IDLE_TIMEOUT
+        self.wheel = TimingWheel(
+            HEARTBEAT_TICK,
+            int(max(self.ping_interval, self.idle_timeout) / HEARTBEAT_TICK) + 1,
+            0,
+        )
+        self._heartbeat: Optional[asyncio.Task] = None
+
+        metrics.gauge("ws.connections", lambda: len(self.active_connections))
+        metrics.gauge("ws.heartbeat_timers", lambda: self.wheel.count)
+        metrics.gauge(
+            "ws.queued_frames",
+            lambda: sum(len(c.queue) for c in self.active_connections.values()),
+        )
+
+    async def start(self):
+        await self.backplane.start()
+        self.presence_store = create_presence_store(
+            self.backplane,
+            self.presence,
+            self._publish_presence,
+            settings.WS_PRESENCE_TTL,
+        )
+        if isinstance(self.presence_store, RedisPresence):
+            await self.presence_store.start()
+            self.presence.load(*await self.presence_store.snapshot())
+        if self.idle_timeout > 0:
+            self._heartbeat = asyncio.create_task(self._run_heartbeat())
 
-    async def connect(self, websocket: WebSocket, token: str = None):
-        await websocket.accept()
+    async def stop(self):
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self.presence_store is not self.presence:
+            await self.presence_store.stop()
+            self.presence_store = self.presence
+        await self.backplane.stop()
+
+    async def connect(
+        self,
+        websocket: WebSocket,
+        token: str = None,
+        batch: bool = False,
+        last_seq: int = None,
+        epoch: str = None,
+        snapshots: bool = False,
+        heartbeat: bool = False,
+    ):
+        codec = "json"
+        subprotocol = None
+        if msgpack is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get(
+            "subprotocols", ()
+        ):
+            codec, subprotocol = "msgpack", MSGPACK_SUBPROTOCOL
+        await websocket.accept(subprotocol=subprotocol)
 
         # Authenticate user if token provided
         if token:
-            db = SessionLocal()
-            try:
-                user = get_user_from_token(token, db)
-                if user:
-                    self.active_connections[websocket] = user
-                    if user.id not in self.user_connections:
-                        self.user_connections[user.id] = set()
-                    self.user_connections[user.id].add(websocket)
-
-                    # Broadcast user joined
-                    await self.broadcast_message(
-                        {
-                            "type": "user_joined",
-                            "data": {
-                                "nickname": user.nickname,
-                                "avatar": user.avatar,
-                                "ageGroup": user.age_group,
-                                "roles": user.roles,
-                            },
-                        },
-                        exclude_user=user.id,
-                    )
-            finally:
-                db.close()
+            async with AsyncSessionLocal() as db:
+                user = await get_user_from_token(token, db)
+            if user:
+                connection = self.register(
+                    websocket,
+                    ConnectedUser.from_user(user),
+                    codec,
+                    batch,
+                    snapshots,
+                    heartbeat,
+                )
+                user = connection.user
+                if self.replay:
+                    self._resume(connection, last_seq, epoch)
+
+                # Announce presence; the first socket of a user broadcasts a join
+                await self._publish_presence(
+                    await self.presence_store.join(user.to_dict()), user.id
+                )
+
+    def register(
+        self,
+        websocket: WebSocket,
+        user: ConnectedUser,
+        codec: str = "json",
+        batch: bool = False,
+        snapshots: bool = False,
+        heartbeat: bool = False,
+    ) -> Connection:
+        """Track an accepted socket for an authenticated user"""
+        user = self.users.setdefault(user.id, user)
+        connection = Connection(websocket, user, codec, batch, snapshots, heartbeat)
+        connection.writer = asyncio.create_task(self._writer(connection))
+        # Only timers the heartbeat task will expire; other sockets rely on
+        # the server's protocol-level pings to detect dead peers
+        if heartbeat and self._heartbeat is not None:
+            if self.ping_interval > 0:
+                self._schedule(
+                    connection, PING, connection.last_seen + self.ping_interval
+                )
+            self._schedule(connection, IDLE, connection.last_seen + self.idle_timeout)
+        self.active_connections[websocket] = connection
+        if user.id not in self.user_connections:
+            self.user_connections[user.id] = set()
+        self.user_connections[user.id].add(websocket)
+        self.subscriptions.add(websocket, user.nickname)
+        return connection
+
+    def _resume(self, connection: Connection, last_seq: int = None, epoch: str = None):
+        """Queue the broadcasts a reconnecting client missed, ahead of new ones"""
+        session = self.replay.session()
+        if last_seq is None:
+            self._enqueue(connection, Frame({"type": "session", "data": session}))
+            return
+
+        missed = self.replay.since(last_seq, epoch, connection.user.id)
+        if missed is None or len(missed) >= self.high_water:
+            # Too far behind for memory: the client reloads history instead
+            metrics.incr("ws.resyncs")
+            self._enqueue(connection, Frame({"type": "resync", "data": session}))
+            return
+
+        self._enqueue(
+            connection,
+            Frame({"type": "session", "data": {**session, "replayed": len(missed)}}),
+        )
+        for frame in missed:
+            self._enqueue(connection, frame)
+        metrics.incr("ws.replayed_events", len(missed))
 
     async def disconnect(self, websocket: WebSocket):
-        user = self.active_connections.get(websocket)
-        if user:
-            # Remove from connections
-            self.user_connections[user.id].discard(websocket)
-            if not self.user_connections[user.id]:
-                del self.user_connections[user.id]
-
-                # Broadcast user left
-                await self.broadcast_message(
-                    {"type": "user_left", "data": {"nickname": user.nickname}},
-                    exclude_user=user.id,
+        connection = self.active_connections.pop(websocket, None)
+        if not connection:
+            return
+
+        connection.closing = True
+        if connection.writer and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        # Drop its heartbeat timers now rather than at their deadlines
+        for timer in connection.timers.values():
+            self.wheel.cancel(timer)
+        connection.timers.clear()
+
+        user = connection.user
+        # Remove from connections
+        self.subscriptions.remove(websocket, user.nickname)
+        self.user_connections[user.id].discard(websocket)
+        if not self.user_connections[user.id]:
+            del self.user_connections[user.id]
+            self.users.pop(user.id, None)
+            if self.coalescer:
+                await self.backplane.publish(
+                    {"op": "offline", "nickname": user.nickname}
                 )
 
-        if websocket in self.active_connections:
-            del self.active_connections[websocket]
+        # The last socket of a user across all workers broadcasts a leave
+        await self._publish_presence(await self.presence_store.leave(user.id), user.id)
 
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
+    async def _writer(self, connection: Connection):
+        """Drain one connection's queue so a slow socket only stalls itself"""
+        websocket = connection.websocket
+        binary = connection.codec == "msgpack"
         try:
-            await websocket.send_text(json.dumps(message))
-        except:
+            while not connection.closing:
+                frame = await connection.next_frame()
+                if connection.batch:
+                    await self._send_batch(connection, frame, binary)
+                elif binary:
+                    await websocket.send_bytes(frame.msgpack)
+                else:
+                    await websocket.send_text(frame.text)
+                metrics.incr("ws.frames_sent")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
             # Connection might be closed
+            metrics.incr("ws.send_errors")
+            await self.disconnect(websocket)
+
+    async def _send_batch(self, connection: Connection, first: Frame, binary: bool):
+        """Wait out the batch window, then write everything queued as one array"""
+        if self.batch_window > 0:
+            await asyncio.sleep(self.batch_window)
+        frames = [first, *connection.drain()]
+        if binary:
+            await connection.websocket.send_bytes(batch_msgpack(frames))
+        else:
+            await connection.websocket.send_text(batch_text(frames))
+        metrics.incr("ws.batched_events", len(frames))
+
+    def _enqueue(self, connection: Connection, frame: Frame, key=None) -> bool:
+        """Queue a frame for one connection; False if it must be disconnected"""
+        if connection.closing:
+            return True
+        outcome = connection.enqueue(frame, self.high_water, self.policy, key)
+        if outcome == "overflow":
+            metrics.incr("ws.slow_consumer_disconnects")
+            return False
+        if outcome != "queued":
+            metrics.incr(f"ws.frames_{outcome}")
+        return True
+
+    async def _drop_slow_consumers(self, websockets: List[WebSocket]):
+        for websocket in websockets:
+            connection = self.active_connections.get(websocket)
+            if connection:
+                self._close_later(websocket, SLOW_CONSUMER_CLOSE_CODE)
+                await self.disconnect(websocket)
+
+    def _close_later(self, websocket: WebSocket, code: int):
+        task = asyncio.create_task(self._close_quietly(websocket, code))
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
             pass
 
-    async def broadcast_message(self, message: dict, exclude_user: int = None):
-        disconnected = []
-        for websocket, user in self.active_connections.items():
-            if exclude_user and user.id == exclude_user:
-                continue
+    async def receive(self, websocket: WebSocket) -> dict:
+        """Read and decode the next client frame in the socket's wire format"""
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            # Any frame from the client shows it is alive
+            connection.last_seen = asyncio.get_running_loop().time()
+        if message.get("bytes") is not None:
+            if connection is not None and connection.codec == "msgpack":
+                return msgpack.unpackb(message["bytes"], raw=False)
+            return loads(message["bytes"])
+        return loads(message["text"])
+
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
+        frame = Frame(message)
+        connection = self.active_connections.get(websocket)
+        if connection is None:
             try:
-                await websocket.send_text(json.dumps(message))
+                await websocket.send_text(frame.text)
             except:
-                disconnected.append(websocket)
+                # Connection might be closed
+                pass
+            return
 
-        # Clean up disconnected websockets
-        for websocket in disconnected:
-            await self.disconnect(websocket)
+        if not self._enqueue(connection, frame):
+            await self._drop_slow_consumers([websocket])
+
+    async def broadcast_message(
+        self, message: dict, exclude_user: int = None, coalesce_key=None
+    ):
+        """Queue a frame for every connection; never awaits socket I/O"""
+        await self.backplane.publish(
+            {
+                "op": "broadcast",
+                "message": message,
+                "exclude_user": exclude_user,
+                "coalesce_key": coalesce_key,
+            }
+        )
 
     async def send_to_user(self, user_id: int, message: dict):
-        if user_id in self.user_connections:
-            disconnected = []
-            for websocket in self.user_connections[user_id]:
-                try:
-                    await websocket.send_text(json.dumps(message))
-                except:
-                    disconnected.append(websocket)
-
-            # Clean up disconnected websockets
-            for websocket in disconnected:
+        await self.backplane.publish(
+            {"op": "user", "user_id": user_id, "message": message}
+        )
+
+    async def publish(
+        self, key, message: dict, exclude_user: int = None, coalesce_key=None
+    ):
+        """Queue a frame for the sockets viewing one conversation"""
+        await self.backplane.publish(
+            {
+                "op": "conversation",
+                "key": key,
+                "message": message,
+                "exclude_user": exclude_user,
+                "coalesce_key": coalesce_key,
+            }
+        )
+
+    async def broadcast_status(
+        self, nickname: str, message: dict, exclude_user: int = None
+    ):
+        """Queue a status frame for sockets that can see this user"""
+        await self.backplane.publish(
+            {
+                "op": "status",
+                "nickname": nickname,
+                "message": message,
+                "exclude_user": exclude_user,
+            }
+        )
+
+    async def refresh_user(self, user: User):
+        """Invalidation hook: push fresh profile data, or drop a banned user"""
+        await self._publish_refresh(ConnectedUser.from_user(user), bool(user.is_banned))
+
+    async def _publish_refresh(self, user: ConnectedUser, banned: bool):
+        if not banned:
+            await self._publish_presence(
+                await self.presence_store.update(user.to_dict())
+            )
+        await self.backplane.publish(
+            {"op": "refresh", "user": asdict(user), "banned": banned}
+        )
+
+    async def _publish_presence(self, diff: Optional[dict], exclude_user: int = None):
+        if diff:
+            await self.backplane.publish(
+                {"op": "presence", "diff": diff, "exclude_user": exclude_user}
+            )
+
+    async def record_private_message(self, chat_id: int, message: dict):
+        """Keep every worker's window of a private chat's history current"""
+        await self.backplane.publish(
+            {"op": "private_message", "chat_id": chat_id, "message": message}
+        )
+
+    async def publish_change(self, *keys: str):
+        """Bump the ETag versions of ``keys`` on every worker"""
+        await self.backplane.publish({"op": "changed", "keys": list(keys)})
+
+    async def set_typing(
+        self, key, nickname: str, is_typing: bool, message: dict, exclude_user: int
+    ):
+        """Announce a typing transition as an event and to the snapshots"""
+        await self.backplane.publish(
+            {
+                "op": "typing",
+                "key": key,
+                "nickname": nickname,
+                "is_typing": is_typing,
+                "message": message,
+                "exclude_user": exclude_user,
+            }
+        )
+
+    async def _on_event(self, event: dict):
+        """Deliver a backplane event to the sockets held by this worker"""
+        op = event["op"]
+        message = event.get("message")
+        exclude_user = event.get("exclude_user")
+
+        if op == "broadcast":
+            if message["type"] == "message":
+                record_room_message(message["data"])
+                versions.bump("messages")
+            await self._deliver(
+                self.active_connections,
+                (
+                    self.replay.append(message, exclude_user)
+                    if self.replay
+                    else Frame(message)
+                ),
+                exclude_user,
+                _hashable(event.get("coalesce_key")),
+            )
+
+        elif op == "user":
+            websockets = list(self.user_connections.get(event["user_id"], ()))
+            await self._deliver(websockets, Frame(message))
+
+        elif op == "conversation":
+            await self.deliver_to_conversation(
+                _hashable(event["key"]),
+                message,
+                exclude_user,
+                _hashable(event.get("coalesce_key")),
+            )
+
+        elif op == "status":
+            nickname = event["nickname"]
+            if self.coalescer:
+                self.coalescer.set_status(nickname, message["data"])
+
+            audience = self.subscriptions.presence_audience(nickname)
+            self._count_saved(audience, exclude_user)
+            await self._deliver(
+                self._per_event(audience),
+                Frame(message),
+                exclude_user,
+                ("user_status", nickname),
+            )
+
+        elif op == "presence":
+            diff = event["diff"]
+            self.presence.apply(diff)
+            await self._deliver(self.active_connections, Frame(diff), exclude_user)
+
+        elif op == "refresh":
+            fresh = ConnectedUser(**event["user"])
+            invalidate_user(fresh.id, fresh.nickname)
+            versions.bump("users", f"profile:{fresh.nickname}", f"settings:{fresh.id}")
+            await self._refresh(fresh, event["banned"])
+
+        elif op == "typing":
+            key = _hashable(event["key"])
+            if self.coalescer:
+                self.coalescer.set_typing(key, event["nickname"], event["is_typing"])
+
+            audience = self.subscriptions.audience(key)
+            self._count_saved(audience, exclude_user)
+            await self._deliver(
+                self._per_event(audience),
+                Frame(message),
+                exclude_user,
+                ("typing", exclude_user, key),
+            )
+
+        elif op == "private_message":
+            window = private_histories.get(event["chat_id"])
+            if window is not None:
+                window.add(message)
+            versions.bump(f"private_chat:{event['chat_id']}")
+
+        elif op == "changed":
+            versions.bump(*event["keys"])
+
+        elif op == "offline" and self.coalescer:
+            self.coalescer.forget(event["nickname"])
+
+    async def _refresh(self, fresh: ConnectedUser, banned: bool):
+        record = self.users.get(fresh.id)
+        if record is None:
+            return
+
+        websockets = list(self.user_connections.get(fresh.id, ()))
+        if banned:
+            for websocket in websockets:
+                self._close_later(websocket, BANNED_CLOSE_CODE)
                 await self.disconnect(websocket)
+            return
+
+        if fresh.nickname != record.nickname:
+            # Views are keyed by nickname, so re-enter them under the new one
+            for websocket in websockets:
+                self.subscriptions.remove(websocket, record.nickname)
+                self.subscriptions.add(websocket, fresh.nickname)
+
+        # Update in place: every connection of this user shares the record
+        for field in ConnectedUser.__slots__:
+            setattr(record, field, getattr(fresh, field))
+
+    async def deliver_to_conversation(
+        self, key, message: dict, exclude_user: int = None, coalesce_key=None
+    ):
+        """Queue a frame for this worker's sockets viewing one conversation"""
+        audience = self.subscriptions.audience(key)
+        self._count_saved(audience, exclude_user)
+        await self._deliver(audience, Frame(message), exclude_user, coalesce_key)
+
+    async def deliver_snapshot(self, key, message: dict, coalesce_key=None):
+        """Queue a presence snapshot for the sockets that asked for them"""
+        audience = [
+            websocket
+            for websocket in self.subscriptions.audience(key)
+            if self.active_connections[websocket].snapshots
+        ]
+        await self._deliver(audience, Frame(message), coalesce_key=coalesce_key)
+
+    def _per_event(self, audience: Set[WebSocket]) -> Iterable[WebSocket]:
+        """The sockets of ``audience`` that get typing and status as events"""
+        if self.coalescer is None:
+            return audience
+        return [
+            websocket
+            for websocket in audience
+            if not self.active_connections[websocket].snapshots
+        ]
+
+    def _count_saved(self, audience: Set[WebSocket], exclude_user: int = None):
+        """Record how many frames a room-wide broadcast would have cost extra"""
+        candidates = len(self.active_connections)
+        if exclude_user:
+            candidates -= len(self.user_connections.get(exclude_user, ()))
+            audience = [
+                ws
+                for ws in audience
+                if self.active_connections[ws].user.id != exclude_user
+            ]
+        metrics.incr("ws.scoped_events")
+        metrics.incr("ws.scoped_frames_saved", candidates - len(audience))
+
+    async def _deliver(
+        self,
+        websockets: Iterable[WebSocket],
+        frame: Frame,
+        exclude_user: int = None,
+        coalesce_key=None,
+    ):
+        """Queue one shared frame per socket; it is serialized on first send"""
+        overflowed = []
+        for websocket in websockets:
+            connection = self.active_connections.get(websocket)
+            if connection is None:
+                continue
+            if exclude_user and connection.user.id == exclude_user:
+                continue
+            if not self._enqueue(connection, frame, coalesce_key):
+                overflowed.append(websocket)
+
+        # Clean up consumers that could not keep up
+        if overflowed:
+            await self._drop_slow_consumers(overflowed)
+
+    async def _run_heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(HEARTBEAT_TICK)
+            try:
+                await self._expire_timers(loop.time())
+            except Exception:
+                logger.exception("Heartbeat tick failed")
+
+    async def _expire_timers(self, now: float):
+        """Ping quiet sockets and reap silent ones; only due timers are visited"""
+        for connection, kind in self.wheel.advance(now):
+            if connection.closing:
+                continue
+
+            if kind == PING:
+                deadline = connection.last_seen + self.ping_interval
+                if deadline <= now:
+                    # Quiet since the last ping: ask the client to answer
+                    self._enqueue(connection, PING_FRAME, PING)
+                    metrics.incr("ws.pings_sent")
+                    deadline = now + self.ping_interval
+                self._schedule(connection, PING, deadline)
+
+            else:
+                deadline = connection.last_seen + self.idle_timeout
+                if deadline <= now:
+                    metrics.incr("ws.reaped_idle")
+                    self._close_later(connection.websocket, IDLE_CLOSE_CODE)
+                    await self.disconnect(connection.websocket)
+                else:
+                    self._schedule(connection, IDLE, deadline)
+
+    def _schedule(self, connection: Connection, kind: str, deadline: float):
+        connection.timers[kind] = self.wheel.schedule((connection, kind), deadline)
 
     async def handle_message(self, websocket: WebSocket, data: dict):
-        user = self.active_connections.get(websocket)
-        if not user:
+        connection = self.active_connections.get(websocket)
+        if not connection:
             return
+        user = connection.user
 
         message_type = data.get("type")
         message_data = data.get("data", {})
 
         if message_type == "typing":
-            # Broadcast typing indicator
-            await self.broadcast_message(
+            chat_type = message_data.get("chatType", "general")
+            target_user = message_data.get("targetUser")
+            key = conversation_key(chat_type, user.nickname, target_user)
+
+            # Typing indicator for the conversation's viewers
+            await self.set_typing(
+                key,
+                user.nickname,
+                bool(message_data.get("isTyping", False)),
                 {
                     "type": "typing",
                     "data": {
                         "nickname": user.nickname,
                         "isTyping": message_data.get("isTyping", False),
-                        "chatType": message_data.get("chatType", "general"),
-                        "targetUser": message_data.get("targetUser"),
+                        "chatType": chat_type,
+                        "targetUser": target_user,
                     },
                 },
                 exclude_user=user.id,
             )
 
+        elif message_type in ("subscribe", "unsubscribe"):
+            # Track which conversation this socket is viewing
+            key = conversation_key(
+                message_data.get("chatType", "general"),
+                user.nickname,
+                message_data.get("targetUser"),
+            )
+            if message_type == "subscribe":
+                self.subscriptions.subscribe(websocket, user.nickname, key)
+            else:
+                self.subscriptions.unsubscribe(websocket, user.nickname, key)
+
         elif message_type == "status_update":
             # Handle status updates
-            await self.broadcast_message(
+            status = message_data.get("status")
+            if status in USER_STATUSES and status != user.status:
+                await self._publish_refresh(replace(user, status=status), False)
+
+            await self.broadcast_status(
+                user.nickname,
                 {
                     "type": "user_status",
                     "data": {
@@ -135,13 +825,7 @@ class WebSocketManager:
 
     def get_online_users(self) -> List[dict]:
         """Get list of currently online users"""
-        users = []
-        seen_users = set()
-        for user in self.active_connections.values():
-            if user.id not in seen_users:
-                users.append(user.to_dict())
-                seen_users.add(user.id)
-        return users
+        return self.presence.list()
 
 
 # Global instance
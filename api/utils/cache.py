@@ -0,0 +1,75 @@
+from collections import OrderedDict
+import time
+from typing import Any, Hashable, Optional
+
+
+class LRUCache:
+    """A bounded mapping that evicts the least recently used entry.
+
+    Not thread-safe: meant for state owned by the event loop. ``hits`` and
+    ``misses`` count ``get`` calls so owners can report them as metrics.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+
+class TTLCache(LRUCache):
+    """An ``LRUCache`` whose entries also expire ``ttl`` seconds after ``set``"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize if ttl > 0 else 0)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = super().get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires <= time.monotonic():
+            # Counted as a hit above, but the caller goes to the source
+            self.hits -= 1
+            self.misses += 1
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store ``value``; a shorter ``ttl`` can be given per entry"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl > 0:
+            super().set(key, (time.monotonic() + ttl, value))
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
@@ -1,7 +1,13 @@
 import random
+from datetime import datetime, timezone
 from typing import List
 
 
+def utcnow() -> datetime:
+    """Current UTC time with microseconds, for ordering timestamps"""
+    return datetime.now(timezone.utc)
+
+
 def generate_avatar_url(nickname: str) -> str:
     """Generate avatar URL using DiceBear API"""
     return f"https://api.dicebear.com/7.x/avataaars/svg?seed={nickname}&backgroundColor=transparent"
@@ -0,0 +1,93 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import desc, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Raises ValueError for anything encode_cursor did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_query(
+    query: Select, model, limit: int, cursor: Optional[str] = None, offset: int = 0
+):
+    """``query`` narrowed to the ``limit + 1`` rows after ``cursor``, newest first.
+
+    ``offset`` skips rows from the newest instead, for clients that have not
+    moved to cursors; it costs a scan of the skipped rows.
+    """
+    if cursor and offset:
+        raise ValueError("Use either cursor or offset")
+    if offset:
+        query = query.offset(offset)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # The bare range on created_at is what lets the index seek
+        query = query.where(
+            model.created_at <= created_at,
+            or_(model.created_at < created_at, model.id < row_id),
+        )
+    return query.order_by(desc(model.created_at), desc(model.id)).limit(limit + 1)
+
+
+async def fetch(db: AsyncSession, query: Select) -> List:
+    """Entities for ``select(Model)``, rows for a projection of several columns"""
+    result = await db.execute(query)
+    if len(query.column_descriptions) == 1:
+        return list(result.scalars())
+    return list(result)
+
+
+async def keyset_page(
+    db: AsyncSession,
+    query: Select,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    offset: int = 0,
+) -> Tuple[List, dict]:
+    """One page of ``query``, newest first, continuing after ``cursor``.
+
+    Rows are ordered by ``(created_at, id)`` and the cursor holds the last
+    row's pair, so each page is an index seek however deep the scrollback.
+    One extra row is fetched to know whether there is another page; the
+    total is only counted when asked for. Returns the rows in chronological
+    order and the pagination block for the response: entities for a query
+    on a model, rows for a column projection.
+    """
+    page = keyset_query(query, model, limit, cursor, offset)
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    rows = await fetch(db, page)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    pagination = {
+        "hasMore": has_more,
+        "nextCursor": (
+            encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+        ),
+    }
+    if total is not None:
+        pagination["total"] = total
+
+    # Reverse to get chronological order
+    rows.reverse()
+    return rows, pagination
@@ -0,0 +1,111 @@
+import json
+from datetime import date, datetime
+from typing import Any, List, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is optional
+    msgpack = None
+
+
+def _default(obj: Any):
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Frame:
+    """A payload serialized at most once, however many sockets it is sent to"""
+
+    __slots__ = ("payload", "_data", "_text", "_msgpack")
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self._data = None
+        self._text = None
+        self._msgpack = None
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data = dumps(self.payload)
+        return self._data
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.data.decode("utf-8")
+        return self._text
+
+    @property
+    def msgpack(self) -> bytes:
+        if self._msgpack is None:
+            self._msgpack = msgpack.packb(self.payload, use_bin_type=True)
+        return self._msgpack
+
+
+def _msgpack_array_header(length: int) -> bytes:
+    if length < 16:
+        return bytes((0x90 | length,))
+    if length < 0x10000:
+        return b"\xdc" + length.to_bytes(2, "big")
+    return b"\xdd" + length.to_bytes(4, "big")
+
+
+def batch_text(frames: List[Frame]) -> str:
+    """A JSON array of already encoded frames, without decoding them again"""
+    return "[" + ",".join(frame.text for frame in frames) + "]"
+
+
+def batch_msgpack(frames: List[Frame]) -> bytes:
+    """A MessagePack array of already encoded frames"""
+    return _msgpack_array_header(len(frames)) + b"".join(
+        frame.msgpack for frame in frames
+    )
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the same encoder as WebSocket frames"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, response: Optional[Response] = None) -> Response:
+    """``content`` rendered now, skipping FastAPI's ``jsonable_encoder`` pass.
+
+    For handlers whose dicts already hold only JSON types, like list pages
+    built from the models' ``*_dict`` helpers. Headers set on the handler's
+    injected ``response`` (such as the ETag) are carried over.
+    """
+    rendered = FastJSONResponse(content)
+    if response is not None:
+        rendered.raw_headers.extend(
+            (name, value)
+            for name, value in response.raw_headers
+            if name not in (b"content-length", b"content-type")
+        )
+    return rendered
@@ -0,0 +1,61 @@
+import math
+from typing import Any, List
+
+
+class TimingWheel:
+    """Hashed timing wheel.
+
+    Scheduling is O(1) and advancing only touches the buckets of elapsed
+    ticks, so expiring timers never requires scanning everything that is
+    scheduled. Deadlines further out than one revolution stay in their
+    bucket until their round comes up. ``schedule`` returns a handle that
+    ``cancel`` takes; a cancelled timer is left in its bucket without its
+    item and dropped when that bucket is next visited.
+    """
+
+    def __init__(self, tick: float, size: int, now: float):
+        self.tick = tick
+        # Entries are [tick, item] lists; a cancelled one has item None
+        self.buckets: List[List[list]] = [[] for _ in range(size)]
+        # Last tick that has been processed
+        self.cursor = int(now // tick)
+        self.count = 0
+
+    def schedule(self, item: Any, deadline: float) -> list:
+        tick = max(math.ceil(deadline / self.tick), self.cursor + 1)
+        entry = [tick, item]
+        self.buckets[tick % len(self.buckets)].append(entry)
+        self.count += 1
+        return entry
+
+    def cancel(self, entry: list):
+        """Forget a scheduled timer; a no-op once it fired or was cancelled"""
+        if entry[1] is not None:
+            entry[1] = None
+            self.count -= 1
+
+    def advance(self, now: float) -> List[Any]:
+        """Pop every item whose deadline is at or before ``now``"""
+        target = int(now // self.tick)
+        due = []
+        # A full revolution visits every bucket once
+        steps = min(target - self.cursor, len(self.buckets))
+        for offset in range(1, steps + 1):
+            index = (self.cursor + offset) % len(self.buckets)
+            bucket = self.buckets[index]
+            if not bucket:
+                continue
+            pending = []
+            for entry in bucket:
+                if entry[1] is None:
+                    continue
+                if entry[0] <= target:
+                    due.append(entry[1])
+                    # Fired: a late cancel must not count it again
+                    entry[1] = None
+                else:
+                    pending.append(entry)
+            self.buckets[index] = pending
+        self.cursor = max(self.cursor, target)
+        self.count -= len(due)
+        return due
@@ -0,0 +1,24 @@
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+from api.config import settings
+
+
+class TunedWebSocketProtocol(WebSocketProtocol):
+    """uvicorn's websockets protocol with configurable permessage-deflate.
+
+    uvicorn only offers deflate with library defaults; this swaps in the
+    compression level and context takeover from settings. Deflate is still
+    only used when the client offers it during the handshake.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.config.ws_per_message_deflate:
+            self.available_extensions = [
+                ServerPerMessageDeflateFactory(
+                    server_no_context_takeover=settings.WS_COMPRESSION_NO_CONTEXT_TAKEOVER,
+                    client_no_context_takeover=settings.WS_COMPRESSION_NO_CONTEXT_TAKEOVER,
+                    compress_settings={"level": settings.WS_COMPRESSION_LEVEL},
+                )
+            ]
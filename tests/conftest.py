@@ -0,0 +1,13 @@
+"""Point the API at a throwaway SQLite database before anything imports it"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault(
+    "DATABASE_URL",
+    "sqlite:///"
+    + os.path.join(tempfile.mkdtemp(prefix="chatconnect_tests_"), "test.db"),
+)
@@ -0,0 +1,153 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from api.services.backplane import RedisBackplane
+from api.services.metrics import metrics
+from api.services.websocket_manager import ConnectedUser, WebSocketManager
+from api.utils.serialization import loads
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str):
+        self.frames.append(loads(text))
+
+
+async def wait_for(condition, timeout: float = 2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+    # Give the other listener the same chance to (wrongly) see the event
+    await asyncio.sleep(0.05)
+
+
+def test_events_reach_every_worker_once():
+    async def run():
+        server = fakeredis.FakeServer()
+        received = {"a": [], "b": []}
+        backplanes = {}
+        for name, events in received.items():
+
+            async def handler(event, events=events):
+                events.append(event)
+
+            backplanes[name] = RedisBackplane(
+                handler,
+                "redis://unused",
+                "test",
+                client=fakeredis.aioredis.FakeRedis(server=server),
+            )
+            await backplanes[name].start()
+
+        event = {"op": "changed", "keys": ["users"]}
+        await backplanes["a"].publish(event)
+        await wait_for(lambda: received["b"])
+
+        # Delivered locally at once; the echo tagged with "a" is skipped
+        assert received["a"] == [event]
+        # The origin tag is stripped before other workers see the event
+        assert received["b"] == [event]
+
+        for backplane in backplanes.values():
+            await backplane.stop()
+            await backplane.client.aclose()
+
+    asyncio.run(run())
+
+
+def test_managers_exchange_socket_events():
+    async def run():
+        server = fakeredis.FakeServer()
+        workers = []
+        for _ in range(2):
+            manager = WebSocketManager()
+            manager.backplane = RedisBackplane(
+                manager._on_event,
+                "redis://unused",
+                "test",
+                client=fakeredis.aioredis.FakeRedis(server=server),
+            )
+            await manager.start()
+            workers.append(manager)
+
+        alice, bobby = RecordingSocket(), RecordingSocket()
+        workers[0].register(alice, ConnectedUser(id=1, nickname="alice"))
+        workers[1].register(bobby, ConnectedUser(id=2, nickname="bobby"))
+
+        message = {
+            "id": "1",
+            "nickname": "alice",
+            "content": "hi",
+            "timestamp": "2024-05-02T21:14:07.512344",
+            "type": "message",
+        }
+        await workers[0].broadcast_message({"type": "message", "data": message})
+        await workers[1].send_to_user(1, {"type": "notification", "data": {}})
+        await wait_for(lambda: len(alice.frames) == 2 and bobby.frames)
+
+        def types(socket):
+            return [frame["type"] for frame in socket.frames]
+
+        assert types(alice) == ["message", "notification"]
+        assert types(bobby) == ["message"]
+
+        for manager in workers:
+            for websocket in list(manager.active_connections):
+                await manager.disconnect(websocket)
+            await manager.stop()
+            await manager.backplane.client.aclose()
+
+    asyncio.run(run())
+
+
+def test_listener_resubscribes_after_losing_redis():
+    async def run():
+        server = fakeredis.FakeServer()
+        received = []
+
+        async def handler(event):
+            received.append(event)
+
+        sender, listener = (
+            RedisBackplane(
+                handler,
+                "redis://unused",
+                "test",
+                client=fakeredis.aioredis.FakeRedis(server=server),
+            )
+            for _ in range(2)
+        )
+        await sender.start()
+        await listener.start()
+        reconnects = metrics.counters["ws.backplane_reconnects"]
+
+        # Redis goes away: the blocked read wakes up to a dead connection
+        server.connected = False
+        connection = listener._pubsub.connection
+        socket = connection._sock
+        await connection.disconnect()
+        socket._response_available.set()
+        await wait_for(lambda: not listener.connected)
+        assert metrics.snapshot()["gauges"]["ws.backplane_connected"] == 0
+
+        server.connected = True
+        await wait_for(lambda: listener.connected)
+        assert metrics.counters["ws.backplane_reconnects"] > reconnects
+
+        event = {"op": "changed", "keys": ["users"]}
+        await sender.publish(event)
+        await wait_for(lambda: len(received) == 2)
+        # Once locally by the sender, once through Redis by the listener
+        assert received == [event, event]
+
+        for backplane in (sender, listener):
+            await backplane.stop()
+            await backplane.client.aclose()
+
+    asyncio.run(run())
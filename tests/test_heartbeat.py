@@ -0,0 +1,39 @@
+import asyncio
+
+from api.services.metrics import metrics
+from api.services.websocket_manager import ConnectedUser, WebSocketManager
+
+
+class QuietSocket:
+    async def send_text(self, text: str):
+        pass
+
+
+def test_reconnect_churn_leaves_no_timers():
+    async def run():
+        manager = WebSocketManager()
+        await manager.start()
+        loop = asyncio.get_running_loop()
+
+        for i in range(100):
+            socket = QuietSocket()
+            manager.register(
+                socket, ConnectedUser(id=i, nickname=f"u{i}"), heartbeat=True
+            )
+            await manager.disconnect(socket)
+        kept = QuietSocket()
+        manager.register(kept, ConnectedUser(id=1000, nickname="kept"), heartbeat=True)
+
+        # Only the open socket's ping and idle timers are counted
+        assert metrics.snapshot()["gauges"]["ws.heartbeat_timers"] == 2
+
+        await manager.disconnect(kept)
+        assert manager.wheel.count == 0
+        # Past every deadline nothing fires, and no closed socket is held
+        await manager._expire_timers(loop.time() + manager.idle_timeout + 1)
+        assert manager.wheel.count == 0
+        assert not any(manager.wheel.buckets)
+
+        await manager.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+import asyncio
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.database import async_url
+from api.migrations import upgrade
+from api.models.message import Message
+from api.services.ingest import MessageIngest
+
+
+def ingest_all(tmp_path, rows):
+    """Submit ``rows`` concurrently; returns each caller's outcome and the row count"""
+    url = f"sqlite:///{tmp_path / 'ingest.db'}"
+    upgrade(create_engine(url))
+
+    async def run():
+        engine = create_async_engine(async_url(url))
+        ingest = MessageIngest(async_sessionmaker(engine, expire_on_commit=False))
+        outcomes = await asyncio.gather(
+            *(ingest.submit(values) for values in rows), return_exceptions=True
+        )
+        async with engine.connect() as connection:
+            count = await connection.scalar(select(func.count()).select_from(Message))
+        await engine.dispose()
+        return outcomes, count
+
+    return asyncio.run(run())
+
+
+def test_each_caller_gets_its_own_row(tmp_path):
+    # Same user, same text: nothing but the ID tells these rows apart
+    rows = [{"user_id": 1, "nickname": "alice", "content": "same"} for _ in range(20)]
+    rows += [{"user_id": 1, "nickname": "alice", "content": f"#{i}"} for i in range(20)]
+    messages, count = ingest_all(tmp_path, rows)
+
+    assert count == 40
+    assert len({message.id for message in messages}) == 40
+    assert [message.content for message in messages] == [r["content"] for r in rows]
+    assert [message.id for message in messages] == sorted(m.id for m in messages)
+
+
+def test_a_bad_row_fails_alone(tmp_path):
+    rows = [{"user_id": 1, "nickname": "alice", "content": f"#{i}"} for i in range(5)]
+    rows[2]["nickname"] = None
+    outcomes, count = ingest_all(tmp_path, rows)
+
+    assert count == 4
+    assert isinstance(outcomes[2], Exception)
+    assert [m.content for i, m in enumerate(outcomes) if i != 2] == [
+        "#0",
+        "#1",
+        "#3",
+        "#4",
+    ]
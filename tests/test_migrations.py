@@ -0,0 +1,17 @@
+from sqlalchemy import create_engine, inspect
+
+from api.database import Base
+from api.migrations import MIGRATIONS, upgrade
+
+
+def test_upgrade_adopts_a_database_built_from_the_models(tmp_path):
+    # Scripts and older deployments created tables straight from the models,
+    # which no longer have private_messages.is_read
+    engine = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    Base.metadata.create_all(bind=engine)
+
+    assert upgrade(engine) == [migration.VERSION for migration in MIGRATIONS]
+    assert upgrade(engine) == []
+    indexes = {i["name"] for i in inspect(engine).get_indexes("private_messages")}
+    assert "ix_private_messages_chat_created" in indexes
+    engine.dispose()
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api.database import async_url
+from api.migrations import upgrade, v0006_microsecond_timestamps
+from api.models.message import MESSAGE_COLUMNS, Message
+from api.utils.pagination import keyset_page
+
+# Rows written before created_at had a Python default: second precision,
+# several in the same second
+LEGACY = ["2024-05-02 21:14:07"] * 4 + ["2024-05-02 21:14:08", "2024-05-02 21:15:00"]
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'pages.db'}"
+    engine = create_engine(url)
+    upgrade(engine)
+    with engine.begin() as connection:
+        for i, created_at in enumerate(LEGACY):
+            connection.execute(
+                text(
+                    "INSERT INTO messages (user_id, nickname, content, message_type,"
+                    " created_at) VALUES (1, 'alice', :content, 'MESSAGE', :created_at)"
+                ),
+                {"content": f"legacy {i}", "created_at": created_at},
+            )
+        connection.execute(
+            insert(Message),
+            [
+                {"user_id": 1, "nickname": "alice", "content": f"new {i}"}
+                for i in range(5)
+            ],
+        )
+        # What upgrade() would have done to a database that had these rows
+        v0006_microsecond_timestamps.upgrade(connection)
+    engine.dispose()
+    return url
+
+
+def pages(url: str, limit: int, cursor: str = None, offset: int = 0, follow=True):
+    """Contents of each page, newest page first; stops after 20 pages"""
+
+    async def run():
+        engine = create_async_engine(async_url(url))
+        session_factory = async_sessionmaker(engine)
+        query = select(*MESSAGE_COLUMNS)
+        seen, next_cursor = [], cursor
+        async with session_factory() as db:
+            for _ in range(20):
+                rows, pagination = await keyset_page(
+                    db, query, Message, limit, next_cursor, offset=offset
+                )
+                seen.append([row.content for row in rows])
+                next_cursor = pagination["nextCursor"]
+                if not (follow and pagination["hasMore"]):
+                    break
+        await engine.dispose()
+        return seen
+
+    return asyncio.run(run())
+
+
+def test_pages_cover_legacy_and_new_rows_once(url):
+    seen = pages(url, 3)
+    contents = [content for page in reversed(seen) for content in page]
+    assert contents == [f"legacy {i}" for i in range(6)] + [
+        f"new {i}" for i in range(5)
+    ]
+
+
+def test_offset_pages_without_a_cursor(url):
+    assert pages(url, 3, offset=4, follow=False) == [["legacy 4", "legacy 5", "new 0"]]
+
+
+def test_cursor_and_offset_are_exclusive(url):
+    with pytest.raises(ValueError):
+        pages(url, 3, cursor="anything", offset=1)
+
+
+def test_normalized_timestamps_keep_their_value(url):
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        stored = connection.scalars(
+            text("SELECT created_at FROM messages WHERE content = 'legacy 5'")
+        ).one()
+    engine.dispose()
+    assert stored == "2024-05-02 21:15:00.000000"
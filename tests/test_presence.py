@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from api.services.backplane import RedisBackplane
+from api.services.presence import PresenceRegistry, RedisPresence
+from api.services.websocket_manager import ConnectedUser, WebSocketManager
+
+ALICE = ConnectedUser(id=1, nickname="alice").to_dict()
+
+
+def worker(server, origin: str, published: list = None) -> RedisPresence:
+    async def publish(diff, exclude_user):
+        published.append(diff)
+
+    return RedisPresence(
+        fakeredis.aioredis.FakeRedis(server=server), "test", origin, 30, publish
+    )
+
+
+def test_joins_and_leaves_are_counted_across_workers():
+    async def run():
+        server = fakeredis.FakeServer()
+        a, b = worker(server, "a"), worker(server, "b")
+        await a.start()
+        await b.start()
+
+        joined = await a.join(ALICE)
+        assert joined["type"] == "user_joined"
+        assert await a.join(ALICE) is None
+        assert await b.join(ALICE) is None
+        assert await b.snapshot() == (1, [ALICE])
+
+        assert await a.leave(1) is None
+        assert await b.leave(1) is None
+        left = await a.leave(1)
+        assert left == {
+            "type": "user_left",
+            "data": {"id": "1", "nickname": "alice", "version": 2},
+        }
+        assert await a.snapshot() == (2, [])
+
+        for presence in (a, b):
+            await presence.stop()
+
+    asyncio.run(run())
+
+
+def test_dead_worker_users_go_offline():
+    async def run():
+        server = fakeredis.FakeServer()
+        published = []
+        a, b = worker(server, "a", published), worker(server, "b", published)
+        await a.start()
+        await b.start()
+        await a.join(ALICE)
+
+        # Worker "a" stalls past its lease: "b" takes alice offline
+        await a.client.delete(a.alive_key("a"))
+        await b.heartbeat()
+        assert [diff["type"] for diff in published] == ["user_left"]
+        assert await b.snapshot() == (2, [])
+        # Releasing twice must not count alice's socket twice
+        await b.heartbeat()
+        assert len(published) == 1
+
+        # "a" comes back and still holds alice's socket
+        await a.heartbeat()
+        assert [diff["type"] for diff in published] == ["user_left", "user_joined"]
+        assert await b.snapshot() == (3, [ALICE])
+        assert await a.leave(1) is not None
+
+        for presence in (a, b):
+            await presence.stop()
+
+    asyncio.run(run())
+
+
+def test_registry_ignores_stale_and_repeated_diffs():
+    registry = PresenceRegistry()
+    registry.load(3, [ALICE])
+    registry.apply({"type": "user_left", "data": {**ALICE, "version": 2}})
+    assert registry.list() == [ALICE]
+
+    left = {"type": "user_left", "data": {"id": "1", "nickname": "alice", "version": 5}}
+    registry.apply(left)
+    # Arrives late from another worker
+    registry.apply({"type": "user_updated", "data": {**ALICE, "version": 4}})
+    registry.apply(left)
+    assert registry.list() == []
+    assert registry.version == 5
+
+
+def test_late_worker_starts_from_the_shared_snapshot():
+    async def run():
+        server = fakeredis.FakeServer()
+        workers = []
+        for _ in range(2):
+            manager = WebSocketManager()
+            manager.backplane = RedisBackplane(
+                manager._on_event,
+                "redis://unused",
+                "test",
+                client=fakeredis.aioredis.FakeRedis(server=server),
+            )
+            workers.append(manager)
+
+        await workers[0].start()
+        await workers[0].presence_store.join(ALICE)
+        await workers[1].start()
+        assert workers[1].presence.list() == [ALICE]
+        assert workers[1].presence.version == 1
+
+        for manager in workers:
+            await manager.stop()
+            await manager.backplane.client.aclose()
+
+    asyncio.run(run())
@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.dialects import postgresql
+
+from api.migrations import upgrade
+from api.migrations.plans import explain, hot_queries, plan_problem
+from api.models.chat import PrivateChatSummary
+from api.models.user import User
+from api.routers import private_chats
+
+QUERIES = hot_queries()
+
+
+@pytest.fixture(scope="module")
+def connection():
+    engine = create_engine("sqlite://")
+    upgrade(engine)
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+
+@pytest.mark.parametrize(
+    "statement, index",
+    [(statement, index) for _, statement, index in QUERIES],
+    ids=[description for description, _, _ in QUERIES],
+)
+def test_hot_query_uses_its_index(connection, statement, index):
+    plan = explain(connection, statement)
+    assert plan_problem(plan, index) is None
+
+
+def test_inbox_lists_empty_chats_last_and_ties_by_chat(connection):
+    connection.execute(
+        insert(User),
+        [{"id": i, "nickname": f"user{i}", "age_group": "adults"} for i in (1, 2)],
+    )
+    sent_at = datetime(2024, 5, 2, tzinfo=timezone.utc)
+    connection.execute(
+        insert(PrivateChatSummary),
+        [
+            {
+                "chat_id": 1,
+                "user_id": 1,
+                "other_user_id": 2,
+                "last_message_at": sent_at,
+            },
+            {"chat_id": 2, "user_id": 1, "other_user_id": 2, "last_message_at": None},
+            {
+                "chat_id": 3,
+                "user_id": 1,
+                "other_user_id": 2,
+                "last_message_at": sent_at,
+            },
+        ],
+    )
+    inbox = private_chats.inbox_query(1).add_columns(PrivateChatSummary.chat_id)
+    assert [row.chat_id for row in connection.execute(inbox)] == [3, 1, 2]
+    connection.rollback()
+
+
+def test_inbox_spells_out_null_order_on_postgres():
+    sql = str(
+        private_chats.inbox_query(1, "postgresql").compile(dialect=postgresql.dialect())
+    )
+    assert "last_message_at DESC NULLS LAST" in sql
+    assert "chat_id DESC" in sql